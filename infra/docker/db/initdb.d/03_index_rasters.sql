@@ -0,0 +1,15 @@
+-- Rasters de índice reduzidos pelo pipeline (um período por bacia), em tiles
+-- com overviews (overview_factor > 1), consultados pela API de séries temporais.
+CREATE TABLE IF NOT EXISTS index_rasters (
+    id serial PRIMARY KEY,
+    basin_id integer NOT NULL,
+    index_name text NOT NULL,
+    period_start date NOT NULL,
+    period_end date NOT NULL,
+    overview_factor smallint NOT NULL DEFAULT 1,
+    rast raster NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS index_rasters_rast_gist ON index_rasters USING gist (ST_ConvexHull(rast));
+CREATE INDEX IF NOT EXISTS index_rasters_lookup_idx
+    ON index_rasters (index_name, overview_factor, period_start, basin_id);
@@ -0,0 +1,13 @@
+-- Colunas usadas pela carga dos indícios por bacia (notebooks/utils/change_detection.py).
+-- Fica fora da transação de carga: ALTER TABLE exige lock exclusivo na tabela.
+DO $$
+BEGIN
+    IF to_regclass('public.indicios_de_cultivo_de_soja') IS NOT NULL THEN
+        ALTER TABLE indicios_de_cultivo_de_soja
+            ADD COLUMN IF NOT EXISTS uh_id integer,
+            ADD COLUMN IF NOT EXISTS run_date date;
+        CREATE INDEX IF NOT EXISTS indicios_de_cultivo_de_soja_uh_id_idx
+            ON indicios_de_cultivo_de_soja (uh_id);
+    END IF;
+END
+$$;
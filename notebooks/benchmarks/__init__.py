@@ -0,0 +1 @@
+"""Benchmarks offline (sem rede) das funções de processamento do pipeline."""
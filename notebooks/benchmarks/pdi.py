@@ -0,0 +1,267 @@
+"""
+Benchmark das funções raster de ``utils.PDI`` com cubos sintéticos.
+
+Monta cubos ``time x y x x x band`` (xarray + dask) no mesmo layout do stackstac,
+sem acesso à rede, e mede para cada função: megapixels/s, pico de RSS e número
+de tasks do grafo dask. Os resultados podem ser gravados como baseline e
+comparados em execuções futuras.
+
+Uso (a partir de ``notebooks/``):
+
+    python -m benchmarks.pdi --size 4096 --time 6
+    python -m benchmarks.pdi --save-baseline           # grava benchmarks/baselines/pdi.json
+    python -m benchmarks.pdi --check --tolerance 0.15  # falha se regredir mais de 15%
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import platform
+import resource
+import tempfile
+import threading
+import time
+
+import dask.array as dsa
+import numpy as np
+import xarray as xr
+
+from utils.PDI import (
+    reduce_period,
+    s1_feats,
+    s2_indices,
+    s2_mask_scale,
+    save_cog,
+    save_geotiff,
+    save_geotiff_fast,
+)
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "pdi.json")
+S2_BANDS = ["nir", "red", "rededge2", "scl", "swir16"]
+S1_BANDS = ["vh", "vv"]
+PIXEL_DEG = 10 / 111_320.0
+
+
+# ---------- Cubos sintéticos ----------
+
+def _coords(size):
+    x = -55.0 + np.arange(size) * PIXEL_DEG
+    y = -13.0 - np.arange(size) * PIXEL_DEG
+    return x, y
+
+
+def synthetic_s2(n_time=4, size=2048, chunk=1024, seed=0):
+    """Cubo S2 em reflectância 0..10000 com SCL inteiro (0..11), chunks como no stackstac."""
+    rs = dsa.random.RandomState(seed)
+    shape = (n_time, size, size, len(S2_BANDS))
+    chunks = (1, chunk, chunk, 1)
+    data = rs.uniform(0, 10000, size=shape, chunks=chunks).astype("float64")
+    scl = rs.randint(0, 12, size=shape[:3] + (1,), chunks=chunks).astype("float64")
+    i = S2_BANDS.index("scl")
+    data = dsa.concatenate([data[..., :i], scl, data[..., i + 1:]], axis=3)
+    x, y = _coords(size)
+    return xr.DataArray(
+        data,
+        dims=("time", "y", "x", "band"),
+        coords={"time": np.arange(n_time), "y": y, "x": x, "band": S2_BANDS},
+        name="s2",
+    )
+
+
+def synthetic_s1(n_time=4, size=2048, chunk=1024, seed=1):
+    """Cubo S1 em retroespalhamento linear (0..0.5)."""
+    rs = dsa.random.RandomState(seed)
+    shape = (n_time, size, size, len(S1_BANDS))
+    data = rs.uniform(0, 0.5, size=shape, chunks=(1, chunk, chunk, 1))
+    x, y = _coords(size)
+    return xr.DataArray(
+        data,
+        dims=("time", "y", "x", "band"),
+        coords={"time": np.arange(n_time), "y": y, "x": x, "band": S1_BANDS},
+        name="s1",
+    )
+
+
+# ---------- Medição ----------
+
+def _rss_bytes():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:  # fora do Linux: ru_maxrss (kB no Linux, bytes no macOS)
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return rss if platform.system() == "Darwin" else rss * 1024
+
+
+class PeakRSS:
+    """Amostra o RSS do processo em uma thread e guarda o pico durante o bloco."""
+
+    def __init__(self, interval=0.01):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, _rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.start = _rss_bytes()
+        self.peak = self.start
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, _rss_bytes())
+
+
+def task_count(obj):
+    graph = getattr(obj, "__dask_graph__", lambda: None)()
+    return len(graph) if graph is not None else 0
+
+
+def measure(name, build, run, pixels, repeat=3):
+    """
+    Mede ``run(build())`` ``repeat`` vezes e guarda o melhor tempo.
+
+    ``build`` monta o objeto lazy (contado em tasks); ``run`` o materializa.
+    """
+    lazy = build()
+    tasks = task_count(lazy)
+    best, peak = float("inf"), 0
+    for _ in range(repeat):
+        with PeakRSS() as rss:
+            t0 = time.perf_counter()
+            run(lazy)
+            elapsed = time.perf_counter() - t0
+        best = min(best, elapsed)
+        peak = max(peak, rss.peak - rss.start)
+    return {
+        "name": name,
+        "seconds": round(best, 4),
+        "mpix_s": round(pixels / best / 1e6, 2),
+        "peak_rss_mb": round(peak / 2**20, 1),
+        "dask_tasks": tasks,
+    }
+
+
+# ---------- Casos ----------
+
+def run_suite(n_time=4, size=2048, chunk=1024, repeat=3):
+    s2 = synthetic_s2(n_time, size, chunk)
+    s1 = synthetic_s1(n_time, size, chunk)
+    cube_px = n_time * size * size
+    compute = lambda obj: obj.compute()
+
+    # entradas materializadas para isolar cada etapa das anteriores
+    s2_scaled = s2_mask_scale(s2).persist()
+    s2_idx = s2_indices(s2_scaled).persist()
+    plane = s2_idx["NDVI"].isel(time=0).compute()
+    x, y = plane.x.values, plane.y.values
+
+    results = [
+        measure("s2_mask_scale", lambda: s2_mask_scale(s2), compute, cube_px, repeat),
+        measure("s2_indices", lambda: s2_indices(s2_scaled), compute, cube_px, repeat),
+        measure("s1_feats", lambda: s1_feats(s1), compute, cube_px, repeat),
+        measure("reduce_period", lambda: reduce_period(s2_idx.chunk({"time": -1})),
+                compute, cube_px, repeat),
+    ]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        writers = {
+            "save_geotiff": save_geotiff,
+            "save_geotiff_fast": save_geotiff_fast,
+            "save_cog": save_cog,
+        }
+        for name, writer in writers.items():
+            path = os.path.join(tmp, f"{name}.tif")
+            results.append(measure(
+                name, lambda: plane.values,
+                lambda arr, w=writer, p=path: w(p, arr, x, y),
+                size * size, repeat,
+            ))
+    return results
+
+
+# ---------- Baseline ----------
+
+def compare(results, baseline, tolerance):
+    """Anota cada resultado com a razão de throughput frente ao baseline."""
+    regressions = []
+    for r in results:
+        ref = baseline.get(r["name"])
+        if not ref:
+            r["vs_baseline"] = None
+            continue
+        r["vs_baseline"] = round(r["mpix_s"] / ref["mpix_s"], 3)
+        if r["vs_baseline"] < 1 - tolerance:
+            regressions.append(r["name"])
+    return regressions
+
+
+def print_table(results):
+    header = f"{'function':<20}{'seconds':>10}{'Mpx/s':>10}{'peak MB':>10}{'tasks':>8}{'vs base':>9}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        ratio = r.get("vs_baseline")
+        ratio = f"{ratio:.2f}x" if ratio else "-"
+        print(f"{r['name']:<20}{r['seconds']:>10.3f}{r['mpix_s']:>10.1f}"
+              f"{r['peak_rss_mb']:>10.1f}{r['dask_tasks']:>8}{ratio:>9}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark offline das funções de utils.PDI.")
+    parser.add_argument("--time", type=int, default=4, help="número de datas do cubo")
+    parser.add_argument("--size", type=int, default=2048, help="lado do cubo em pixels")
+    parser.add_argument("--chunk", type=int, default=1024)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--check", action="store_true", help="sai com erro se houver regressão")
+    parser.add_argument("--tolerance", type=float, default=0.10)
+    parser.add_argument("--json", help="grava os resultados neste arquivo")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.time, args.size, args.chunk, args.repeat)
+    params = {"time": args.time, "size": args.size, "chunk": args.chunk}
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            stored = json.load(f)
+        if stored.get("params") == params:
+            baseline = stored["results"]
+        else:
+            print(f"Baseline params {stored.get('params')} differ from {params}; skipping comparison.")
+    regressions = compare(results, baseline, args.tolerance)
+    print_table(results)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"params": params, "results": results}, f, indent=2)
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as f:
+            json.dump({"params": params, "results": {r["name"]: r for r in results}}, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    if regressions:
+        print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1 if args.check else 0
+    missing = [r["name"] for r in results if r["vs_baseline"] is None]
+    if args.check and missing and not args.save_baseline:
+        # sem baseline comparável o gate não pode passar em silêncio
+        print(f"ERROR: no comparable baseline in {args.baseline} for: {', '.join(missing)}. "
+              "Run with --save-baseline on the reference machine first.")
+        return 2
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,9 +1,11 @@
+import math
 import numpy as np
 import xarray as xr
 from pystac_client import Client
 import stackstac, rasterio
 from rasterio.transform import Affine
 from datetime import datetime
+from typing import NamedTuple
 
 
 # ---------- Utilitários ----------
@@ -28,7 +30,76 @@ def search_stac(stac_url, collection, start, end, aoi, extra=None):
     if extra: params.update(extra)
     return list(cat.search(**params).get_items())
 
-def stack_s2(items, bbox, PIXEL_RES=10, CHUNK=1024):
+# ---------- Grade comum ----------
+
+METERS_PER_DEGREE = 111_320.0
+
+
+class GridSpec(NamedTuple):
+    """Grade de pixels compartilhada por todos os sensores e datas de uma AOI."""
+    epsg: int
+    bounds: tuple      # (minx, miny, maxx, maxy) alinhados à resolução
+    resolution: float  # em unidades do CRS
+    shape: tuple       # (height, width)
+
+    @property
+    def transform(self) -> Affine:
+        minx, _, _, maxy = self.bounds
+        return Affine(self.resolution, 0, minx, 0, -self.resolution, maxy)
+
+    def coords(self):
+        """Coordenadas x/y (canto superior esquerdo, como no stackstac)."""
+        minx, _, _, maxy = self.bounds
+        h, w = self.shape
+        x = minx + np.arange(w) * self.resolution
+        y = maxy - np.arange(h) * self.resolution
+        return x, y
+
+
+def make_grid(bbox, resolution_m=10, epsg=4326) -> GridSpec:
+    """
+    Calcula uma única vez a grade de pixels de uma AOI.
+
+    bbox: [minlon, minlat, maxlon, maxlat] em EPSG:4326.
+    resolution_m: tamanho do pixel em metros (convertido para graus em EPSG:4326).
+    """
+    if epsg == 4326:
+        minx, miny, maxx, maxy = bbox
+        res = resolution_m / METERS_PER_DEGREE
+    else:
+        from pyproj import Transformer
+        tr = Transformer.from_crs(4326, epsg, always_xy=True)
+        minx, miny, maxx, maxy = tr.transform_bounds(*bbox)
+        res = float(resolution_m)
+
+    # alinha os limites a múltiplos da resolução -> mesma grade para qualquer cena
+    col0, row0 = math.floor(minx / res), math.floor(miny / res)
+    w = max(1, math.ceil(maxx / res) - col0)
+    h = max(1, math.ceil(maxy / res) - row0)
+    bounds = (col0 * res, row0 * res, col0 * res + w * res, row0 * res + h * res)
+    return GridSpec(epsg=epsg, bounds=bounds, resolution=res, shape=(h, w))
+
+
+def _on_grid(da: xr.DataArray, grid: GridSpec) -> xr.DataArray:
+    # o stackstac pode gerar 1 pixel a mais por arredondamento de float;
+    # recorta e reatribui as coordenadas exatas da grade para o join="exact"
+    h, w = grid.shape
+    if da.sizes["y"] < h or da.sizes["x"] < w:
+        raise RuntimeError(f"Stack {da.sizes['y']}x{da.sizes['x']} menor que a grade {h}x{w}.")
+    x, y = grid.coords()
+    return da.isel(y=slice(0, h), x=slice(0, w)).assign_coords(x=x, y=y)
+
+
+def _stack(items, assets, bbox, resolution, chunksize, grid):
+    if grid is None:
+        return stackstac.stack(items, assets=assets, bounds_latlon=bbox, epsg=4326,
+                               resolution=resolution, chunksize=chunksize)
+    da = stackstac.stack(items, assets=assets, bounds=grid.bounds, epsg=grid.epsg,
+                         resolution=grid.resolution, snap_bounds=False, chunksize=chunksize)
+    return _on_grid(da, grid)
+
+
+def stack_s2(items, bbox, PIXEL_RES=10, CHUNK=1024, grid=None):
     # Earth Search usa aliases: red(B04), nir(B08), swir16(B11), rededge2(B06), scl(mask)
     assets = ("red","nir","swir16","rededge2","scl")
     common = set(assets)
@@ -37,10 +108,10 @@ def stack_s2(items, bbox, PIXEL_RES=10, CHUNK=1024):
     if not req.issubset(common):
         raise RuntimeError(f"S2 sem assets mínimos {req}. Presentes: {sorted(common)}")
     use = sorted(common)
-    da = stackstac.stack(items, assets=use, bounds_latlon=bbox, epsg=4326, resolution=PIXEL_RES, chunksize=CHUNK)
+    da = _stack(items, use, bbox, PIXEL_RES, CHUNK, grid)
     return da.transpose("time","y","x","band")
 
-def stack_s1(items, bbox, chunksize=1024):
+def stack_s1(items, bbox, chunksize=1024, grid=None):
     # Confere assets comuns (alguns itens podem vir sem vh/vv)
     wanted = {"vv", "vh"}
     common = set(wanted)
@@ -52,14 +123,7 @@ def stack_s1(items, bbox, chunksize=1024):
         raise RuntimeError(f"S1 sem vv/vh em todos os itens. Comuns: {sorted(common)} | Exemplo: {ex}")
 
     use_assets = ["vv", "vh"]  # <<<<< LISTA, não tupla
-    da = stackstac.stack(
-        items,
-        assets=use_assets,       # <<<<< LISTA
-        bounds_latlon=bbox,
-        epsg=4326,
-        resolution=10,
-        chunksize=chunksize,
-    )
+    da = _stack(items, use_assets, bbox, 10, chunksize, grid)
     return da.transpose("time", "y", "x", "band")
 
 
@@ -194,4 +258,30 @@ def save_geotiff_fast(path, array2d, x, y, crs="EPSG:4326",
 
     with rio_fast_env():
         with rasterio.open(path, "w", **profile) as dst:
-            dst.write(array2d, 1)
\ No newline at end of file
+            dst.write(array2d, 1)
+
+def save_cog(path, array2d, x, y, crs="EPSG:4326", dtype="float32",
+             compress="ZSTD", block=512, nodata=np.nan):
+    # Cloud Optimized GeoTIFF: blocos + overviews internas, prontos para leitura
+    # por janelas/overviews (ex.: serviço de tiles da API)
+    from rasterio.io import MemoryFile
+    from rasterio.shutil import copy as rio_copy
+
+    if hasattr(array2d, "compute"):
+        array2d = array2d.compute()
+    array2d = np.asarray(array2d).astype(dtype)
+    h, w = array2d.shape
+
+    profile = {
+        "driver": "GTiff", "height": h, "width": w, "count": 1,
+        "dtype": dtype, "crs": crs, "transform": affine_from_coords(x, y),
+        "nodata": nodata,
+    }
+    with rio_fast_env():
+        with MemoryFile() as mem:
+            with mem.open(**profile) as tmp:
+                tmp.write(array2d, 1)
+            with mem.open() as src:
+                rio_copy(src, path, driver="COG", COMPRESS=compress, BLOCKSIZE=block,
+                         PREDICTOR="YES", OVERVIEW_RESAMPLING="AVERAGE",
+                         BIGTIFF="IF_SAFER", NUM_THREADS="ALL_CPUS")
@@ -0,0 +1,133 @@
+"""
+Cache de artefatos endereçado por conteúdo para as etapas do montador de mosaicos.
+
+Cada etapa registra um manifesto em ``<root>/_manifests/<etapa>/<chave>.json``,
+onde a chave é o hash das entradas da etapa (ids de cena, hrefs, geometrias,
+parâmetros e chaves das etapas anteriores). Uma etapa só é refeita quando a
+chave muda ou quando algum dos arquivos listados no manifesto sumiu, então
+reexecutar um território após uma falha, ou com uma cena nova, refaz apenas o
+que foi invalidado.
+
+Como os arquivos são nomeados pela chave, versões antigas se acumulam;
+``ArtifactStore.prune`` remove os manifestos (e arquivos) que a execução atual
+não usou.
+"""
+import hashlib
+import json
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+
+
+def _default(obj):
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, (np.integer, np.floating)):
+        return obj.item()
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _remove(path):
+    """Remove ``path``; 0 se outro processo já o removeu."""
+    try:
+        os.remove(path)
+        return 1
+    except FileNotFoundError:
+        return 0
+
+
+def content_key(stage, inputs):
+    """Hash estável das entradas de uma etapa."""
+    payload = json.dumps({"stage": stage, "inputs": inputs}, sort_keys=True, default=_default)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+class ArtifactStore(object):
+    """
+    Manifestos de artefatos por etapa e chave de conteúdo.
+
+    Atributos:
+        root (str): diretório dos manifestos (normalmente o diretório do território).
+        stats (dict): contagem de ``hit``/``miss`` por etapa na execução atual.
+        used (set): manifestos ``(etapa, chave)`` lidos ou gravados nesta execução.
+    """
+    def __init__(self, root):
+        self.root = root
+        self.stats = defaultdict(lambda: {"hit": 0, "miss": 0})
+        self.used = set()
+
+    def _path(self, stage, key):
+        return os.path.join(self.root, "_manifests", stage, f"{key}.json")
+
+    def load(self, stage, key, max_age=None):
+        """Manifesto válido (arquivos presentes e dentro de ``max_age`` s) ou None."""
+        path = self._path(stage, key)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            manifest = json.load(f)
+        if not all(os.path.exists(p) for p in manifest["files"]):
+            return None
+        if max_age is not None and time.time() - manifest["created_at"] > max_age:
+            return None
+        self.used.add((stage, key))
+        os.utime(path)  # último uso, ver ``prune(older_than=...)``
+        return manifest
+
+    def save(self, stage, key, data, files=()):
+        path = self._path(stage, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"stage": stage, "key": key, "created_at": time.time(),
+                       "files": list(files), "data": data}, f, default=_default)
+        os.replace(tmp, path)  # manifesto só existe depois que os arquivos existem
+        self.used.add((stage, key))
+
+    def prune(self, older_than=None):
+        """
+        Remove os manifestos não usados nesta execução e os arquivos que só eles listam.
+
+        older_than: se definido (s), poupa manifestos usados há menos tempo que
+            isso. Use em diretórios compartilhados (``assets_dir``), onde outros
+            territórios podem depender de artefatos que esta execução não tocou.
+
+        Arquivos e manifestos que somem durante a varredura (outro processo
+        podando o mesmo diretório) são ignorados.
+
+        Returns:
+            int: quantidade de manifestos removidos.
+        """
+        manifests_dir = os.path.join(self.root, "_manifests")
+        if not os.path.isdir(manifests_dir):
+            return 0
+        keep_files, stale = set(), []
+        now = time.time()
+        for stage in os.listdir(manifests_dir):
+            for name in os.listdir(os.path.join(manifests_dir, stage)):
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(manifests_dir, stage, name)
+                try:
+                    with open(path) as f:
+                        files = json.load(f)["files"]
+                    recent = older_than is not None and now - os.path.getmtime(path) < older_than
+                except FileNotFoundError:
+                    continue
+                if (stage, name[:-5]) in self.used or recent:
+                    keep_files.update(files)
+                else:
+                    stale.append((path, files))
+        removed = 0
+        for path, files in stale:
+            for file in files:
+                if file not in keep_files:
+                    _remove(file)
+            removed += _remove(path)
+        return removed
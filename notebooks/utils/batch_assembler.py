@@ -0,0 +1,146 @@
+"""
+Montagem de mosaicos para vários territórios com uma única busca de cenas.
+
+Municípios vizinhos usam as mesmas cenas; em vez de uma busca STAC e um
+download por território, o lote:
+
+1. faz uma busca sobre a união dos envelopes de impressão;
+2. distribui as cenas aos territórios pelo footprint (``STRtree``);
+3. baixa cada TCI de baixa resolução uma única vez num diretório compartilhado
+   (``assets_dir``), reaproveitado pelos manifestos de ``ArtifactStore``; cenas
+   cujo download falhou no processo principal não são repassadas aos workers.
+   Os trechos de alta resolução são recortados por território e não são
+   compartilhados;
+4. processa os territórios em paralelo, em processos separados, enviando os
+   mosaicos para o ``Storage`` configurado (S3, MinIO ou diretório local);
+5. poda o ``assets_dir`` uma única vez, ao final, no processo principal.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from pystac import Item
+from shapely import STRtree
+from shapely.geometry import mapping, shape
+from shapely.ops import unary_union
+
+from .artifacts import ArtifactStore
+from .inpe_image_assembler import INPEImageAssembler
+from .storage import storage_from_env
+from .territory import Territory, TerritoryCollection
+
+
+def _ids_and_envelopes(territories):
+    """Ids (objetos Python) e envelopes shapely, sem materializar `Territory` de uma coleção."""
+    if isinstance(territories, TerritoryCollection):
+        return territories.id_list(), territories.envelopes()
+    return [t.id for t in territories], [shape(t.bbox_optimum) for t in territories]
+
+
+def assign_scenes(items, territories):
+    """
+    Distribui as cenas pelos territórios cujo envelope o footprint intersecta.
+
+    Args:
+        territories (list | TerritoryCollection): territórios do lote.
+
+    Returns:
+        dict: ``{territory.id: [Item, ...]}`` (territórios sem cena ficam com lista vazia).
+    """
+    ids, envelopes = _ids_and_envelopes(territories)
+    tree = STRtree(envelopes)
+    assigned = {tid: [] for tid in ids}
+    for item in items:
+        for idx in tree.query(shape(item.geometry), predicate="intersects"):
+            assigned[ids[idx]].append(item)
+    return assigned
+
+
+def _assemble_one(territory, items, output_dir, assets_dir, storage, max_workers, assembler_kwargs):
+    """Executado no processo filho: monta e envia o mosaico de um território."""
+    if isinstance(territory, dict):  # argumentos vindos de `TerritoryCollection.territory_kwargs`
+        territory = Territory(**territory)
+    # o output_dir já foi limpo pelo processo principal (resume=False apagaria os
+    # downloads compartilhados e os territórios vizinhos em andamento) e o
+    # `assets_dir` é podado uma única vez por ele
+    assembler_kwargs = {**assembler_kwargs, "resume": True, "asset_max_age": None}
+    assembler = INPEImageAssembler(output_dir, max_workers=max_workers, storage=storage,
+                                   assets_dir=assets_dir, **assembler_kwargs)
+    return assembler.process_items(territory, [Item.from_dict(d) for d in items])
+
+
+def assemble_territories(territories, collection, start_date, end_date, output_dir="/tmp/inpe_images",
+                         assets_dir=None, workers=2, max_workers=4, storage=None, limit=1000,
+                         **assembler_kwargs):
+    """
+    Monta os mosaicos de vários territórios compartilhando busca e downloads.
+
+    Args:
+        territories (list | TerritoryCollection): territórios do lote.
+        collection (str): coleção STAC (ex.: 'S2-16D-2').
+        start_date, end_date (date): período da busca.
+        output_dir (str): diretório raiz (um subdiretório por território).
+        assets_dir (str, opcional): downloads compartilhados. Padrão: ``<output_dir>/_assets``.
+        workers (int): territórios processados em paralelo.
+        max_workers (int): downloads simultâneos por território.
+        storage (Storage, opcional): destino dos mosaicos. Padrão: ``storage_from_env()``.
+        limit (int): máximo de cenas da busca conjunta.
+        **assembler_kwargs: repassados a ``INPEImageAssembler`` (ex.: ``hex_resolution``).
+
+    Returns:
+        tuple: (mosaicos ``{id: caminho}``, erros ``{id: mensagem}``).
+    """
+    if not isinstance(territories, TerritoryCollection):
+        territories = list(territories)
+    ids, envelopes = _ids_and_envelopes(territories)
+    storage = storage or storage_from_env()
+    assets_dir = assets_dir or os.path.join(output_dir, "_assets")
+
+    # busca única sobre a união dos envelopes; com resume=False o construtor
+    # limpa o output_dir aqui, uma vez, antes de qualquer download
+    assembler = INPEImageAssembler(output_dir, max_workers=max_workers, storage=storage,
+                                   assets_dir=assets_dir, **assembler_kwargs)
+    os.makedirs(assets_dir, exist_ok=True)
+    assembler.store = ArtifactStore(output_dir)
+    assembler.asset_store = ArtifactStore(assets_dir)
+    aoi = unary_union(envelopes)
+    print(f"Batch search for {len(ids)} territories")
+    assembler.search_scenes(collection, mapping(aoi), start_date, end_date, limit=limit)
+    by_territory = assign_scenes(assembler.items, territories)
+
+    # TCIs de baixa resolução baixados uma vez; os workers encontram os manifestos
+    needed = {i.id for items in by_territory.values() for i in items}
+    assembler.items = [i for i in assembler.items if i.id in needed]
+    assembler.download_low_resolution_asset()
+    available = set(assembler.assets)  # sem TCI ou com falha após as tentativas
+    if needed - available:
+        print(f"Skipping {len(needed - available)} scenes without low resolution asset")
+    by_territory = {tid: [i for i in items if i.id in available] for tid, items in by_territory.items()}
+
+    mosaics, errors = {}, {}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for idx, tid in enumerate(ids):
+            items = by_territory[tid]
+            if not items:
+                errors[tid] = "no scenes intersect the territory"
+                continue
+            if isinstance(territories, TerritoryCollection):
+                territory = territories.territory_kwargs(idx)  # o `Territory` é criado no worker
+            else:
+                territory = territories[idx]
+            future = pool.submit(_assemble_one, territory, [i.to_dict() for i in items],
+                                 output_dir, assets_dir, storage, max_workers, assembler_kwargs)
+            futures[future] = tid
+        for n, future in enumerate(as_completed(futures), start=1):
+            tid = futures[future]
+            try:
+                mosaics[tid] = future.result()
+                print(f"[{n}/{len(futures)}] territory {tid}: {mosaics[tid]}")
+            except Exception as e:
+                errors[tid] = str(e)
+                print(f"[{n}/{len(futures)}] territory {tid} failed: {e}")
+    print(f"Batch artifact cache: {dict(assembler.store.stats)}")
+    if assembler.prune and assembler.asset_max_age is not None:
+        removed = assembler.asset_store.prune(older_than=assembler.asset_max_age)
+        print(f"Pruned {removed} stale shared assets")
+    return mosaics, errors
@@ -0,0 +1,158 @@
+"""
+Detecção de indícios de soja no vazio sanitário e carga direta no PostGIS.
+
+A partir das saídas reduzidas do pipeline (janela do vazio e baseline), limiariza
+o dNDVI em conjunto com o retroespalhamento S1 (``VV_dB``/``VH_dB``), vetoriza a
+máscara bloco a bloco e carrega os polígonos via ``COPY`` na tabela servida pela
+API, substituindo apenas as linhas da bacia processada.
+"""
+from __future__ import annotations
+
+import io
+from datetime import date
+
+import numpy as np
+import shapely
+from rasterio import features
+from rasterio.transform import Affine
+
+from .PDI import affine_from_coords
+from .database import copy_rows, get_engine
+
+
+INDICIOS_TABLE = "indicios_de_cultivo_de_soja"
+
+# Vegetação verde durante o vazio (NDVI alto, pouca queda frente ao baseline)
+# com resposta de dossel no radar.
+DEFAULT_THRESHOLDS = {
+    "ndvi_min": 0.5,
+    "dndvi_min": -0.1,
+    "vv_db_min": -15.0,
+    "vh_db_min": -20.0,
+}
+
+
+def detect_soja(vazio, dndvi, thresholds=None):
+    """
+    Gera a máscara booleana de indícios de soja.
+
+    Args:
+        vazio (xr.Dataset): saída de ``reduce_period`` da janela do vazio
+            (precisa de ``NDVI_med``, ``VV_dB_med`` e ``VH_dB_med``).
+        dndvi (xr.DataArray): diferença de NDVI vazio - baseline, na mesma grade.
+        thresholds (dict, opcional): sobrescreve ``DEFAULT_THRESHOLDS``.
+
+    Returns:
+        xr.DataArray: máscara booleana (pixels NaN ficam como False).
+    """
+    t = DEFAULT_THRESHOLDS | (thresholds or {})
+    mask = (
+        (vazio["NDVI_med"] >= t["ndvi_min"])
+        & (dndvi >= t["dndvi_min"])
+        & (vazio["VV_dB_med"] >= t["vv_db_min"])
+        & (vazio["VH_dB_med"] >= t["vh_db_min"])
+    )
+    return mask.rename("soja")
+
+
+def polygonize_blocks(mask, block=2048, min_pixels=10):
+    """
+    Vetoriza a máscara em janelas de ``block`` x ``block`` pixels.
+
+    O ``sieve`` (remoção de manchas menores que ``min_pixels``) roda sobre a
+    máscara inteira, para que um polígono cortado pela borda de uma janela não
+    perca os pedaços. A máscara é materializada em memória (uint8; o pipeline já
+    a tem computada) e só a vetorização é feita por janelas, limitando o tamanho
+    de cada polígono. Polígonos que cruzam a borda entre janelas saem partidos;
+    a união é feita no banco (ver ``load_indicios``).
+
+    Yields:
+        shapely.Polygon: polígonos no CRS da grade.
+    """
+    transform = affine_from_coords(mask.x.values, mask.y.values)
+    full = np.asarray(mask.values, dtype=np.uint8)
+    if min_pixels > 1 and full.any():
+        full = features.sieve(full, size=min_pixels)
+    h, w = full.shape
+    for row in range(0, h, block):
+        for col in range(0, w, block):
+            arr = full[row:row + block, col:col + block]
+            if not arr.any():
+                continue
+            win_transform = transform * Affine.translation(col, row)
+            for geom, _ in features.shapes(arr, mask=arr.astype(bool), transform=win_transform):
+                yield shapely.geometry.shape(geom)
+
+
+def load_indicios(connection_uri, polygons, basin_id, run_date=None,
+                  table=INDICIOS_TABLE, srid=4326):
+    """
+    Substitui os indícios de uma bacia na tabela ``table`` em uma única transação.
+
+    Os polígonos vão para uma tabela temporária via ``COPY`` (WKB hex), são
+    unidos (juntando os pedaços cortados nas bordas dos blocos), recortados pelo
+    polígono da unidade hidrográfica (a bacia é processada sobre o envelope, que
+    se sobrepõe aos das vizinhas) e inseridos com ``uh_id`` e ``run_date``. As
+    linhas anteriores da mesma bacia são removidas,
+    inclusive as importadas sem ``uh_id`` que intersectam a unidade hidrográfica.
+    As colunas ``uh_id``/``run_date`` e o índice vêm de
+    ``infra/docker/db/initdb.d/04_indicios_uh.sql`` (rode-o uma vez em bancos já existentes).
+
+    Returns:
+        int: quantidade de polígonos inseridos.
+    """
+    run_date = run_date or date.today()
+    buffer = io.StringIO()
+    for wkb in shapely.to_wkb(np.fromiter(polygons, dtype=object), hex=True):
+        buffer.write(wkb)
+        buffer.write("\n")
+    buffer.seek(0)
+
+    conn = get_engine(connection_uri).raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("CREATE TEMP TABLE _indicios_stage (geom geometry) ON COMMIT DROP")
+        copy_rows(cur, "COPY _indicios_stage (geom) FROM STDIN", buffer)
+        cur.execute(f"""
+            DELETE FROM {table} t
+            WHERE t.uh_id = %(uh_id)s
+               OR (t.uh_id IS NULL AND EXISTS (
+                    SELECT 1 FROM unidades_hidrograficas u
+                    WHERE u.id = %(uh_id)s
+                      AND ST_Intersects(t.geom, ST_Transform(u.geom, ST_SRID(t.geom)))))
+        """, {"uh_id": basin_id})
+        cur.execute(f"""
+            WITH d AS (
+                SELECT ST_Transform(ST_SetSRID(geom, %(srid)s),
+                                    Find_SRID('public', '{table}', 'geom')) AS geom
+                FROM (SELECT (ST_Dump(ST_Union(geom))).geom FROM _indicios_stage) s
+            ),
+            c AS (
+                SELECT ST_CollectionExtract(
+                           ST_Intersection(d.geom, ST_Transform(u.geom, ST_SRID(d.geom))), 3) AS geom
+                FROM d
+                JOIN unidades_hidrograficas u
+                  ON u.id = %(uh_id)s
+                 AND ST_Intersects(d.geom, ST_Transform(u.geom, ST_SRID(d.geom)))
+            )
+            INSERT INTO {table} (geom, uh_id, run_date)
+            SELECT ST_Multi(geom), %(uh_id)s, %(run_date)s
+            FROM c
+            WHERE NOT ST_IsEmpty(geom)
+        """, {"srid": srid, "uh_id": basin_id, "run_date": run_date})
+        inserted = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return inserted
+
+
+def run_change_detection(connection_uri, vazio, dndvi, basin_id, run_date=None,
+                         thresholds=None, block=2048, min_pixels=10):
+    """Etapa completa: limiarização -> vetorização por blocos -> carga no PostGIS."""
+    mask = detect_soja(vazio, dndvi, thresholds)
+    polygons = polygonize_blocks(mask, block=block, min_pixels=min_pixels)
+    return load_indicios(connection_uri, polygons, basin_id, run_date=run_date)
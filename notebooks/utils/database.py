@@ -1,9 +1,42 @@
-
 """Helpers for composing raster and vector map layers."""
 from __future__ import annotations
-from typing import Any, Dict, Optional
+import os
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, Iterator, Optional
 from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
 import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+
+def pg_uri_from_env() -> str:
+    """Build a PostgreSQL URI from the ``DB_*`` environment variables used by the notebooks."""
+
+    return "postgresql://{0}:{1}@{2}:{3}/{4}".format(
+        os.environ.get("DB_USER", "hack_user"),
+        os.environ.get("DB_PASSWORD", "hack_pass"),
+        os.environ.get("DB_HOST", "localhost"),
+        os.environ.get("DB_PORT", "5433"),
+        os.environ.get("DB_NAME", "hackathon"),
+    )
+
+
+@lru_cache(maxsize=None)
+def _engine(connection_uri: str, pid: int) -> Engine:
+    return create_engine(connection_uri, pool_pre_ping=True)
+
+
+def get_engine(connection_uri: str) -> Engine:
+    """Return a pooled engine for ``connection_uri``, shared by every call in this process.
+
+    The cache is keyed by PID so forked pipeline workers never reuse the parent's connections.
+    """
+
+    return _engine(connection_uri, os.getpid())
+
 
 def fetch_vector_from_postgres(
     connection_uri: str,
@@ -13,9 +46,84 @@ def fetch_vector_from_postgres(
 ) -> gpd.GeoDataFrame:
     """Read a GeoDataFrame from a PostGIS enabled PostgreSQL database."""
 
-    engine = create_engine(connection_uri)
-    try:
-        gdf = gpd.read_postgis(sql=sql, con=engine, geom_col=geom_column, params=params)
-    finally:
-        engine.dispose()
-    return gdf
\ No newline at end of file
+    return gpd.read_postgis(sql=sql, con=get_engine(connection_uri), geom_col=geom_column, params=params)
+
+
+def iter_vector_from_postgres(
+    connection_uri: str,
+    sql: str,
+    geom_column: str = "geom",
+    params: Optional[Dict[str, Any]] = None,
+    chunksize: int = 50_000,
+) -> Iterator[gpd.GeoDataFrame]:
+    """Yield GeoDataFrames of at most ``chunksize`` rows read through a server-side cursor.
+
+    Only one chunk is held in memory at a time, so whole layers can be scanned with a
+    bounded footprint. The connection stays checked out until the generator is exhausted
+    or closed.
+    """
+
+    with get_engine(connection_uri).connect() as conn:
+        streaming = conn.execution_options(stream_results=True, max_row_buffer=chunksize)
+        yield from gpd.read_postgis(
+            sql=sql, con=streaming, geom_col=geom_column, params=params, chunksize=chunksize
+        )
+
+
+def copy_rows(cursor, sql: str, buffer) -> None:
+    """Run ``COPY ... FROM STDIN`` feeding it the contents of a text ``buffer``."""
+
+    # psycopg2 (URI postgresql://) or psycopg 3 (postgresql+psycopg://)
+    if hasattr(cursor, "copy_expert"):
+        cursor.copy_expert(sql, buffer)
+    else:
+        with cursor.copy(sql) as copy:
+            copy.write(buffer.getvalue())
+
+
+def _copy_to(cursor, sql: str, params: Optional[Dict[str, Any]], buffer) -> None:
+    # psycopg2 (URI postgresql://) or psycopg 3 (postgresql+psycopg://)
+    if hasattr(cursor, "copy_expert"):
+        statement = cursor.mogrify(sql, params).decode() if params else sql
+        cursor.copy_expert(statement, buffer)
+    else:
+        with cursor.copy(sql, params) as copy:
+            for block in copy:
+                buffer.write(block)
+
+
+def fetch_vector_bulk(
+    connection_uri: str,
+    sql: str,
+    geom_column: str = "geom",
+    params: Optional[Dict[str, Any]] = None,
+    spool_mb: int = 256,
+) -> gpd.GeoDataFrame:
+    """Bulk-read a query through ``COPY ... TO STDOUT`` and decode geometries in one pass.
+
+    PostGIS writes geometries as hex EWKB in the COPY text output, so rows are parsed by
+    ``pandas.read_csv`` and geometries by the vectorized ``shapely.from_wkb`` instead of
+    row-by-row through the DB-API. Intended for full-layer pulls (``imoveis``,
+    ``soja_2024``); non-geometry columns get pandas' CSV type inference. The payload is
+    spooled to a temporary file once it exceeds ``spool_mb``.
+    """
+
+    copy_sql = f"COPY ({sql}) TO STDOUT WITH (FORMAT csv, HEADER)"
+    with tempfile.SpooledTemporaryFile(max_size=spool_mb * 2**20, mode="w+b") as buffer:
+        conn = get_engine(connection_uri).raw_connection()
+        try:
+            cur = conn.cursor()
+            _copy_to(cur, copy_sql, params, buffer)
+            conn.commit()
+        finally:
+            conn.close()
+        buffer.seek(0)
+        df = pd.read_csv(buffer, dtype={geom_column: object})
+
+    wkb = df[geom_column].to_numpy(dtype=object)
+    wkb[pd.isna(wkb)] = None
+    geoms = shapely.from_wkb(wkb)
+    srids = shapely.get_srid(geoms)
+    srid = int(srids[srids > 0][0]) if np.any(srids > 0) else None
+    df[geom_column] = geoms
+    return gpd.GeoDataFrame(df, geometry=geom_column, crs=f"EPSG:{srid}" if srid else None)
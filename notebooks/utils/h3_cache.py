@@ -0,0 +1,107 @@
+"""
+Cache de cobertura H3 por geometria e resolução.
+
+As células ficam em arrays ``int64`` ordenados (8 bytes por célula, contra ~70
+de uma string H3 num ``set``), que a seleção de cenas indexa direto com numpy
+(ver ``set_cover.index_cells``). O cache é mantido em memória (LRU) e,
+opcionalmente, em disco como ``.npy``; ``INPEImageAssembler`` o consulta via
+``Territory.hex_centres``.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+from h3 import cell_to_boundary, cell_to_latlng, geo_to_cells, int_to_str, str_to_int
+
+
+def geometry_key(geom):
+    """Hash estável de uma geometria GeoJSON (dict)."""
+    return hashlib.sha1(json.dumps(geom, sort_keys=True).encode()).hexdigest()[:20]
+
+
+def cells_to_int(cells):
+    """Células H3 (strings) -> array int64 ordenado e sem repetição."""
+    cells = list(cells)
+    return np.unique(np.fromiter(map(str_to_int, cells), dtype=np.int64, count=len(cells)))
+
+
+def cells_to_str(cells):
+    """Array int64 -> lista de strings H3 (para as APIs do h3 que exigem strings)."""
+    return [int_to_str(int(c)) for c in cells]
+
+
+def cells_bbox(cells):
+    """Bounding box ``[minlon, minlat, maxlon, maxlat]`` dos hexágonos (não só dos centros)."""
+    latlng = np.array([cell_to_boundary(int_to_str(int(c))) for c in cells]).reshape(-1, 2)
+    return [float(latlng[:, 1].min()), float(latlng[:, 0].min()),
+            float(latlng[:, 1].max()), float(latlng[:, 0].max())]
+
+
+class H3CoverageCache(object):
+    """
+    Cache de células H3 que cobrem uma geometria.
+
+    Atributos:
+        cache_dir (str | None): diretório para persistir os arrays entre execuções.
+        maxsize (int): entradas mantidas em memória.
+    """
+    def __init__(self, cache_dir=None, maxsize=256):
+        self.cache_dir = cache_dir
+        self.maxsize = maxsize
+        self._memory = OrderedDict()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def get_or_compute(self, key, compute):
+        """Retorna o array de ``key`` (memória -> disco -> ``compute()``)."""
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return self._memory[key]
+
+        path = os.path.join(self.cache_dir, f"{key}.npy") if self.cache_dir else None
+        if path and os.path.exists(path):
+            value = np.load(path)
+        else:
+            value = np.asarray(compute())
+            if path:
+                tmp = f"{path}.{os.getpid()}.tmp.npy"
+                np.save(tmp, value)
+                os.replace(tmp, path)
+
+        self._memory[key] = value
+        if len(self._memory) > self.maxsize:
+            self._memory.popitem(last=False)
+        return value
+
+    def cells(self, geom, resolution):
+        """Células (int64 ordenado) cujo centro cai dentro de ``geom``."""
+        key = f"cells_{geometry_key(geom)}_r{resolution}"
+        return self.get_or_compute(key, lambda: cells_to_int(geo_to_cells(geom, resolution)))
+
+    def centres(self, geom, resolution):
+        """
+        Células e seus centros: ``(cells, lat, lng)``, alinhados por posição.
+        """
+        cells = self.cells(geom, resolution)
+        key = f"centres_{geometry_key(geom)}_r{resolution}"
+        latlng = self.get_or_compute(
+            key,
+            lambda: np.array([cell_to_latlng(int_to_str(int(c))) for c in cells]).reshape(-1, 2),
+        )
+        return cells, latlng[:, 0], latlng[:, 1]
+
+    def clear(self):
+        self._memory.clear()
+
+
+_DEFAULT_CACHE = None
+
+
+def get_coverage_cache():
+    """Instância compartilhada (disco habilitado se ``H3_CACHE_DIR`` estiver definido)."""
+    global _DEFAULT_CACHE
+    if _DEFAULT_CACHE is None:
+        _DEFAULT_CACHE = H3CoverageCache(cache_dir=os.environ.get("H3_CACHE_DIR"))
+    return _DEFAULT_CACHE
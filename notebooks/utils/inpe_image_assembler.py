@@ -1,35 +1,85 @@
-from h3 import geo_to_cells
+from pystac import Item
 from pystac_client import Client
-import boto3
 import json
 import os
 import subprocess
-import pandas as pd
-from .utils import simplificar_poligono,  geojson_para_wkt, bbox_dos_hexagonos, calcular_pixels_utilizados
-from .make_gdalenhance_lut import make_gdalenhance_lut
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .useful_area import useful_area_hexes
+from .h3_cache import cells_bbox, cells_to_str, geometry_key, get_coverage_cache
+from .set_cover import greedy_set_cover, scene_weights
+from .mosaic import build_mosaic
+from .artifacts import ArtifactStore, content_key
+from .storage import storage_from_env
+from .tracing import Tracer
+import numpy as np
 from h3 import cells_to_geo
 
 STAC_API_URL = "https://data.inpe.br/bdc/stac/v1"
-BUCKET_NAME = os.environ['BUCKET_NAME']
 
-S3_CLIENT = boto3.client('s3')
+# etapas cujos arquivos dependem só da cena (não do território): podem ficar
+# num diretório compartilhado entre territórios (`assets_dir`). Os trechos de
+# alta resolução são recortados na extensão e grade de cada território, então
+# ficam no diretório do território.
+ASSET_STAGES = ("low_res",)
 
 
 class INPEImageAssembler(object):
 
-    def __init__(self, output_dir="/tmp/inpe_images"):
+    def __init__(self, output_dir="/tmp/inpe_images", max_workers=4, retries=3, backoff=2.0,
+                 hex_resolution=8, coverage_cache=None, resume=True, search_max_age=6 * 3600,
+                 storage=None, assets_dir=None, profile=False, prune=True,
+                 asset_max_age=30 * 86400):
         """
         start_date: str (data de início) no formato 'YYYY-MM-DD'
         end_date: str (data de término) no formato 'YYYY-MM-DD' 
+        max_workers: int downloads (gdalwarp) simultâneos
+        retries: int tentativas por asset antes de desistir
+        backoff: float espera base (s) entre tentativas, dobrada a cada falha
+        hex_resolution: int resolução H3 da análise de cobertura
+        coverage_cache: H3CoverageCache opcional (padrão: cache global compartilhado)
+        resume: bool reaproveita artefatos de execuções anteriores (False apaga o output_dir)
+        search_max_age: int validade (s) do resultado da busca STAC em cache
+        storage: destino dos mosaicos (`storage.Storage`; padrão: `storage_from_env()`)
+        assets_dir: diretório compartilhado para os downloads de cenas (padrão:
+            diretório de cada território)
+        profile: bool perfila cada etapa com cProfile (`<território>/_profile/*.prof`)
+        prune: bool ao final, apaga artefatos do território que a execução não usou
+        asset_max_age: int (s) no `assets_dir` compartilhado, só apaga downloads
+            sem uso há mais que isso (None: não poda o `assets_dir`, como nos
+            workers do lote, em que o processo principal poda uma única vez)
         """
         self.output_dir = output_dir
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timings = {}
+        self.hex_resolution = hex_resolution
+        self.coverage = coverage_cache or get_coverage_cache()
+        self.resume = resume
+        self.search_max_age = search_max_age
+        self.store = None
+        self.asset_store = None
+        self.storage = storage or storage_from_env()
+        self.assets_dir = assets_dir
+        self._client = None
+        self.profile = profile
+        self.prune = prune
+        self.asset_max_age = asset_max_age
+        self.tracer = Tracer("inpe_image_assembler")
         if not os.path.exists(output_dir):
             os.makedirs(output_dir)
-        else:
+        elif not resume:
             subprocess.run(f"rm -rf {output_dir}/*", shell=True)
-            
-        headers = []
-        self.client = Client.open(STAC_API_URL, headers=headers, timeout=(3, 10))
+
+    @property
+    def client(self):
+        # aberto sob demanda: workers que recebem as cenas prontas não consultam o STAC
+        if self._client is None:
+            headers = []
+            self._client = Client.open(STAC_API_URL, headers=headers, timeout=(3, 10))
+        return self._client
 
     def search_scenes(self, collection, geom, start_date, end_date, limit=1000):
         """
@@ -37,6 +87,15 @@ class INPEImageAssembler(object):
         Retorna: lista de features (imagens encontradas)
         """
         self.items = []     
+        key = content_key("search", {
+            "collection": collection, "geom": geom, "limit": limit,
+            "start": start_date.strftime('%Y-%m-%d'), "end": end_date.strftime('%Y-%m-%d'),
+        })
+        manifest = self._cached("search", key, max_age=self.search_max_age)
+        if manifest:
+            self.items = [Item.from_dict(d) for d in manifest["data"]]
+            print(f"Using cached search: {len(self.items)} images in {collection}")
+            return
         try:
             search = self.client.search(
                 collections=[collection],
@@ -49,148 +108,215 @@ class INPEImageAssembler(object):
                 print(f"Found {len(items)} images in {collection}")
                 items.sort(key=lambda x: x.properties["datetime"], reverse=True)
                 self.items = items
+                self._record("search", key, [i.to_dict() for i in items])
             else:
                 print(f"No images found in {collection}")
         except Exception as e:
             print(f"Error searching {collection} images: {str(e)}")
 
-    def download_low_resolution_asset(self):
+    def _cached(self, stage, key, max_age=None):
+        """
+        Manifesto válido da etapa (ver `artifacts.ArtifactStore`) ou None.
+        """
+        store = self.asset_store if stage in ASSET_STAGES else self.store
+        if store is None:
+            return None
+        manifest = store.load(stage, key, max_age=max_age)
+        self.store.stats[stage]["hit" if manifest else "miss"] += 1
+        return manifest
+
+    def _record(self, stage, key, data=None, files=()):
+        store = self.asset_store if stage in ASSET_STAGES else self.store
+        if store is not None:
+            store.save(stage, key, data, files)
+
+    def _stage_dir(self, stage):
+        if stage in ASSET_STAGES and self.assets_dir:
+            return self.assets_dir
+        return self.territory_output_dir
+
+    def _run_with_retry(self, cmd, label):
+        """
+        Executa um comando GDAL com novas tentativas e backoff exponencial.
+        Retorna o tempo (s) da tentativa bem-sucedida.
+
+        O último argumento do comando é o arquivo de saída: o GDAL grava num
+        temporário exclusivo e o arquivo só aparece, completo, ao final
+        (downloads simultâneos do mesmo asset não leem arquivos parciais).
+        """
+        output = cmd[-1]
+        base, ext = os.path.splitext(output)
+        tmp = f"{base}.{os.getpid()}.{threading.get_ident()}.tmp{ext}"
+        cmd = [*cmd[:-1], tmp]
+        for attempt in range(1, self.retries + 1):
+            start = time.perf_counter()
+            try:
+                with self.tracer.span(cmd[0], label=label, attempt=attempt) as span:
+                    subprocess.run(cmd, check=True, capture_output=True)
+                    os.replace(tmp, output)
+                    span.set(output_bytes=os.path.getsize(output))
+                return time.perf_counter() - start
+            except subprocess.CalledProcessError as e:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                if attempt == self.retries:
+                    raise RuntimeError(f"{label} failed after {attempt} attempts: {e.stderr.decode(errors='ignore')}") from e
+                wait = self.backoff * 2 ** (attempt - 1)
+                print(f"{label} failed (attempt {attempt}/{self.retries}), retrying in {wait:.0f}s")
+                time.sleep(wait)
+
+    def _download_many(self, jobs, stage, on_complete=None):
+        """
+        Baixa vários assets em paralelo (até `max_workers` gdalwarp simultâneos).
+
+        jobs: dict {id: cmd}
+        on_complete: callable(id) chamado na thread principal assim que cada
+            download termina, enquanto os demais continuam em andamento.
+        """
+        total = len(jobs)
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {pool.submit(self._run_with_retry, cmd, f"{stage} {k}"): k for k, cmd in jobs.items()}
+            for n, future in enumerate(as_completed(futures), start=1):
+                k = futures[future]
+                try:
+                    elapsed = future.result()
+                except RuntimeError as e:
+                    failed[k] = str(e)
+                    print(f"[{n}/{total}] {stage} {k}: {e}")
+                    continue
+                self.timings.setdefault(k, {})[stage] = round(elapsed, 2)
+                print(f"[{n}/{total}] {stage} {k} in {elapsed:.1f}s")
+                if on_complete:
+                    on_complete(k)
+        return failed
+
+    def download_low_resolution_asset(self, on_complete=None):
         """
         Baixa imagens de pré-visualização (baixa resolução) para análise.
+
+        on_complete: callable(id) opcional executado a cada cena baixada
+            (ex.: cálculo da área útil sobreposto aos demais downloads).
         """
         self.assets = {}
+        jobs = {}
+        cached = []
+        res = 500/112000
         for i in self.items:
             if 'tci' in i.assets:
                 asset_url = f"/vsicurl/{i.assets['tci'].get_absolute_href()}"
-                output_file = os.path.join(self.territory_output_dir, f"{i.id}_low_res.tif")
-                cmd = [
+                key = content_key("low_res", {"asset_url": asset_url, "tr": res, "r": "max"})
+                output_file = os.path.join(self._stage_dir("low_res"), f"{i.id}_{key}_low_res.tif")
+                self.assets[i.id] = {
+                    "asset_url": asset_url,
+                    "low_res": output_file,
+                    "low_res_key": key,
+                }
+                if self._cached("low_res", key):
+                    cached.append(i.id)
+                    continue
+                jobs[i.id] = [
                     "gdalwarp",
-                    "-tr", f"{500/112000}", f"{500/112000}",
+                    "-tr", f"{res}", f"{res}",
                     "-r", "max",
                     "-t_srs", "EPSG:4326",
+                    "-overwrite",
                     asset_url,
                     output_file
                 ]
-                subprocess.run(cmd, check=True)
-                self.assets[i.id] = {
-                    "asset_url": asset_url,
-                    "low_res": output_file
-                }
             else:
                 print(f"No TCI asset found for {i.id}")
 
+        def done(k):
+            self._record("low_res", self.assets[k]["low_res_key"], files=[self.assets[k]["low_res"]])
+            if on_complete:
+                on_complete(k)
+
+        if cached:
+            print(f"Reusing {len(cached)} low resolution assets")
+        for k in cached:
+            if on_complete:
+                on_complete(k)
+        failed = self._download_many(jobs, "low_res", on_complete=done)
+        for k in failed:
+            del self.assets[k]
+
     def calculate_image_useful_area(self):
         """
         Calcula a área útil de cada imagem.
         Atualiza os itens com a área útil calculada.
         """
-        for k, item in self.assets.items():
-            print(f"Calculating useful area for {k} - {item}")
-            footprint_path = os.path.join(self.territory_output_dir, f"{k}_footprint.tif")
-            footprint_geojson_path = os.path.join(self.territory_output_dir, f'{k}_footprint.geojson')
-
-            areautil_path = os.path.join(self.territory_output_dir, f'{k}_areautil.tif')
-            areautil_geojson_path = os.path.join(self.territory_output_dir, f'{k}_areautil.geojson')
-
-            subprocess.run([
-                "gdal_calc.py",
-                "-A", item["low_res"], "--A_band=1",
-                "-B", item["low_res"], "--B_band=2",
-                "-C", item["low_res"], "--C_band=3",
-                f"--outfile={footprint_path}",
-                "--calc=\"logical_and(A>0,B>0,C>0)\"",
-                "--NoDataValue=0",
-                "--overwrite"
-            ])
-
-            subprocess.run([
-                "gdal_calc.py",
-                "-A", item["low_res"], "--A_band=1",
-                "-B", item["low_res"], "--B_band=2",
-                "-C", item["low_res"], "--C_band=3",
-                f"--outfile={areautil_path}",
-                "--calc=\"(logical_and(A>0,B>0,C>0)*1 - logical_and(A>125,B>125,C>125)*1)==1\"",
-                "--NoDataValue=0",
-                "--overwrite"
-            ])
-
-            subprocess.run([
-                "gdal_polygonize.py",
-                footprint_path,
-                "-mask", footprint_path,
-                "-f", "GeoJSON",
-                footprint_geojson_path,
-            ])
-
-            subprocess.run([
-                "gdal_polygonize.py",
-                areautil_path,
-                "-mask", areautil_path,
-                "-f", "GeoJSON",
-                areautil_geojson_path,
-            ])
-            
-
-            with open(footprint_geojson_path, 'r') as f:
-                footprint_pol = json.load(f)['features'][0]['geometry']
-
-            with open(areautil_geojson_path, 'r') as f:
-                areautil_pol = json.load(f)            
-
-           
-            hex_resolution = 8  # Hex resolution of 8
-            aoi_hexes = set(geo_to_cells(self.territory.bbox_optimum, hex_resolution))  # Hex resolution of 8
-
-            footprint_hexes = set(geo_to_cells(footprint_pol, hex_resolution)).intersection(aoi_hexes)
-
-            areautil_hexes = []
-            for feature in areautil_pol['features']:
-                areautil_hexes.extend(geo_to_cells(feature['geometry'], hex_resolution))
-            areautil_hexes= set(areautil_hexes).intersection(aoi_hexes)
-
-            if len(footprint_hexes) > 0 and len(areautil_hexes)/len(footprint_hexes) > 0.90:
-                item["useful_area"] = footprint_pol
-
-            print("Useful area calculation completed.")
+        for k in self.assets:
+            self.calculate_scene_useful_area(k)
+
+    def calculate_scene_useful_area(self, k):
+        """
+        Calcula a área útil de uma cena já baixada em baixa resolução.
+
+        As máscaras são calculadas em memória sobre o TCI de baixa resolução e
+        cada hexágono da AOI é testado pelo pixel do seu centro. Células da AOI
+        e coberturas por cena vêm do cache H3 compartilhado.
+        """
+        item = self.assets[k]
+        print(f"Calculating useful area for {k} - {item}")
+        footprint_geojson_path = os.path.join(self.territory_output_dir, f'{k}_footprint.geojson')
+        areautil_geojson_path = os.path.join(self.territory_output_dir, f'{k}_areautil.geojson')
+
+        aoi = self.territory.bbox_optimum
+        key = content_key("useful_area", {
+            "low_res": item.get("low_res_key", item["low_res"]),
+            "aoi": geometry_key(aoi),
+            "hex_resolution": self.hex_resolution,
+        })
+        item["useful_area_key"] = key
+        manifest = self._cached("useful_area", key)
+        if manifest:
+            footprint_hexes = np.asarray(manifest["data"]["footprint"], dtype=np.int64)
+            areautil_hexes = np.asarray(manifest["data"]["areautil"], dtype=np.int64)
+        else:
+            with self.tracer.span("useful_area", scene=k):
+                cells, lat, lng = self.territory.hex_centres(self.hex_resolution, self.coverage)
+                footprint_hexes, areautil_hexes = useful_area_hexes(item["low_res"], cells, lat, lng)
+
             with open(footprint_geojson_path, 'w') as f:
-                f.write(json.dumps(cells_to_geo(footprint_hexes, False)))
+                f.write(json.dumps(cells_to_geo(cells_to_str(footprint_hexes), False)))
 
             with open(areautil_geojson_path, 'w') as f:
-                f.write(json.dumps(cells_to_geo(areautil_hexes, False)))
+                f.write(json.dumps(cells_to_geo(cells_to_str(areautil_hexes), False)))
+
+            self._record("useful_area", key,
+                         {"footprint": footprint_hexes, "areautil": areautil_hexes},
+                         files=[footprint_geojson_path, areautil_geojson_path])
 
-    def select_image_patches(self):
+        if len(footprint_hexes) > 0 and len(areautil_hexes)/len(footprint_hexes) > 0.90:
+            item["useful_area"] = footprint_hexes
+
+        print("Useful area calculation completed.")
+
+    def select_image_patches(self, weight_by=None):
         """
         Seleciona os melhores trechos de cada cena com base em critérios como:
         cobertura, ausência de nuvem, posição e sobreposição.
-        """
-        hex_resolution = 8  # Hex resolution of 8
-        aoi_hexes = set(geo_to_cells(self.territory.bbox_optimum, hex_resolution))  # Hex resolution of 8
 
-        img_ids = []
-        hex_ids = [] 
-
-        for k, item in self.assets.items():
-            if 'useful_area' in item:
-                hexes = set(geo_to_cells(item['useful_area'], hex_resolution)).intersection(aoi_hexes)
-                hex_ids.extend(hexes)
-                img_ids.extend([k for n in range(len(hexes))])
+        weight_by: tupla opcional com 'date' e/ou 'cloud' para priorizar cenas
+            recentes e/ou com menos nuvem (ver `set_cover.scene_weights`).
+            Sem pesos, escolhe sempre a cena que cobre mais hexágonos novos.
+        """
+        # useful_area já contém os hexágonos da AOI cobertos pela cena
+        candidates = {k: item['useful_area'] for k, item in self.assets.items() if 'useful_area' in item}
+        weights = scene_weights(self.items, by=weight_by) if weight_by else None
 
-        df = pd.DataFrame({
-            'hex_id': hex_ids,
-            'img_id': img_ids
+        key = content_key("selection", {
+            "candidates": {k: self.assets[k].get("useful_area_key") for k in candidates},
+            "weights": weights,
         })
-
-        hexes_a_cobrir = set(df['hex_id'].unique())
-        imagens_selecionadas = {}
-        selection_order = []
-
-        while hexes_a_cobrir:
-            cobertura = df[df['hex_id'].isin(hexes_a_cobrir)].groupby('img_id')['hex_id'].nunique()
-            melhor_img = cobertura.idxmax()   
-            selection_order.append(melhor_img) 
-            hexes_cobertos_por_melhor = set(df[df['img_id'] == melhor_img]['hex_id']) & hexes_a_cobrir
-            imagens_selecionadas[melhor_img] = hexes_cobertos_por_melhor
-            hexes_a_cobrir -= hexes_cobertos_por_melhor
+        manifest = self._cached("selection", key)
+        if manifest:
+            selection_order = manifest["data"]["order"]
+            imagens_selecionadas = {k: np.asarray(v, dtype=np.int64) for k, v in manifest["data"]["selected"].items()}
+        else:
+            selection_order, imagens_selecionadas = greedy_set_cover(candidates, weights)
+            self._record("selection", key, {"order": selection_order, "selected": imagens_selecionadas})
         self.selected_images = imagens_selecionadas
         self.selection_order = selection_order
         return imagens_selecionadas
@@ -200,105 +326,97 @@ class INPEImageAssembler(object):
         Baixa os trechos selecionados em alta resolução.
         """
         epsg = "EPSG:4326"
+        jobs = {}
+        keys = {}
         for img_id, hexes in self.selected_images.items():
-            bbox_hex = bbox_dos_hexagonos(hexes)
+            bbox_hex = cells_bbox(hexes)
             minlon, minlat, maxlon, maxlat = bbox_hex
-            largura_px, altura_px = calcular_pixels_utilizados(
-                self.territory.bbox_optimum, 
-                bbox_hex, 
-                self.territory.paper_width_px, 
-                self.territory.paper_height_px)
-            output_file = os.path.join(self.territory_output_dir, f"{img_id}_high_res.tif")
-            cmd = [
+            largura_px, altura_px = self.territory.pixels_for(bbox_hex)
+            key = content_key("high_res", {
+                "asset_url": self.assets[img_id]['asset_url'],
+                "te": bbox_hex, "ts": [largura_px, altura_px], "of": "COG",
+            })
+            output_file = os.path.join(self._stage_dir("high_res"), f"{img_id}_{key}_high_res.tif")
+            self.assets[img_id]['high_res'] = output_file
+            self.assets[img_id]['high_res_key'] = keys[img_id] = key
+            if self._cached("high_res", key):
+                continue
+            jobs[img_id] = [
                 "gdalwarp",
                 "-te", str(minlon), str(minlat), str(maxlon), str(maxlat),
                 "-te_srs", epsg,
                 "-ts", str(largura_px), str(altura_px),
                 "-t_srs", epsg,
                 "-r", "bilinear",
+                # COG: overviews internas para o histograma amostrado do mosaico
+                "-of", "COG",
+                "-co", "COMPRESS=DEFLATE",
                 "-overwrite",
                 self.assets[img_id]['asset_url'], 
                 output_file
             ]
-            subprocess.run(cmd, check=True)
-            self.assets[img_id]['high_res'] = output_file
 
-    # def calibrate_contrast_reference(self):
-    #     """
-    #     Identifica o trecho com melhor contraste para usar como referência.
-    #     """
+        if len(jobs) < len(keys):
+            print(f"Reusing {len(keys) - len(jobs)} high resolution patches")
+        failed = self._download_many(
+            jobs, "high_res",
+            on_complete=lambda k: self._record("high_res", keys[k], files=[self.assets[k]['high_res']]),
+        )
+        if failed:
+            raise RuntimeError(f"High resolution download failed for {sorted(failed)}")
 
-    #     biggest_image = os.path.join(self.territory_output_dir, f"{self.selection_order[0]}_high_res.tif")
-    #     self.contrast_path = os.path.join(self.territory_output_dir, "contrast.gdalenhance")
-    #     scales = make_gdalenhance_lut(
-    #         biggest_image,
-    #         self.contrast_path,
-    #         p_low=2, p_high=98, gamma=1
-    #     )
-
-    def apply_contrast_to_all(self):
-        """
-        Aplica a correção de contraste nos demais trechos com base na referência.
+    def build_mosaic(self):
         """
-        import re
-        from collections import defaultdict
-        by_date = defaultdict(list)
-        pat = re.compile(r'_(\d{8})_')
-
-        for s in self.selection_order:
-            m = pat.search(s)
-            if not m:
-                continue  # ou raise se quiser ser estrito
-            date = m.group(1)
-            by_date[date].append(s)
-
-
-        for date in by_date:
-            images = by_date[date]
-            img_id = images[0]
-            contrast_path = os.path.join(self.territory_output_dir, f"{date}_contrast.gdalenhance")
-            biggest_image = os.path.join(self.territory_output_dir, f"{img_id}_high_res.tif")
-            make_gdalenhance_lut(
-                biggest_image,
-                contrast_path,
-                p_low=1, p_high=99, gamma=2
-            )
-            for img_id in images:
-                input_file = os.path.join(self.territory_output_dir, f"{img_id}_high_res.tif")
-                output_file = os.path.join(self.territory_output_dir, f"{img_id}_enhance.tif")
-                cmd = [
-                    "gdalenhance",
-                    "-config", contrast_path,
-                    input_file,
-                    output_file
-                ]
-                subprocess.run(cmd, check=True)
-                self.assets[img_id]['enhance'] = output_file
+        Gera o mosaico final em uma única escrita (COG), sem arquivos intermediários.
 
-    def generate_mosaic(self):
-        """
-        Gera o mosaico final a partir dos trechos corrigidos.
+        A LUT de contraste de cada data vem de um histograma amostrado das
+        overviews dos trechos (COG) e é aplicada
+        pelo GDAL durante a leitura de um VRT montado na ordem de sobreposição.
         """
-        images = self.selection_order
-        images.reverse()  # Ordem de sobreposição: do mais antigo para o mais recente    
-        inputs = [self.assets[img_id]['enhance'] for img_id in images]
-        mosaic_path = os.path.join(self.territory_output_dir, f"mosaic_{self.territory.id}.tif")
-
-        cmd = [
-            "gdal_merge.py",
-            "-o", mosaic_path,
-            "-of", "GTiff",
-            "-co", "COMPRESS=LZW",
-            *inputs
-        ]
-        subprocess.run(cmd, check=True)
+        order = list(reversed(self.selection_order))  # o primeiro selecionado fica por cima
+        paths = {img_id: self.assets[img_id]['high_res'] for img_id in order}
+        contrast = {"p_low": 1, "p_high": 99, "gamma": 2}
+        key = content_key("mosaic", {
+            "order": order,
+            "high_res": [self.assets[img_id].get('high_res_key', paths[img_id]) for img_id in order],
+            **contrast,
+        })
+        mosaic_path = os.path.join(self.territory_output_dir, f"mosaic_{self.territory.id}_{key}.tif")
+        if not self._cached("mosaic", key):
+            with self.tracer.span("build_mosaic", images=len(order)) as span:
+                build_mosaic(paths, order, mosaic_path, **contrast)
+                span.set(output_bytes=os.path.getsize(mosaic_path))
+            self._record("mosaic", key, files=[mosaic_path])
         self.mosaic_path = mosaic_path
 
-        S3_CLIENT.upload_file( self.mosaic_path, BUCKET_NAME, f"territorios/mosaic_{self.territory.id}.tif")
+        s3_key = f"territorios/mosaic_{self.territory.id}.tif"
+        upload_key = content_key("upload", {"mosaic": key, "storage": repr(self.storage), "s3_key": s3_key})
+        if not self._cached("upload", upload_key):
+            with self.tracer.span("upload", bytes=os.path.getsize(self.mosaic_path)):
+                uri = self.storage.upload(self.mosaic_path, s3_key)
+            self._record("upload", upload_key, {"uri": uri})
 
     def clean_outputdir(self):
         subprocess.run(f"rm -rf {self.output_dir}/*", shell=True)
 
+    def _prepare_territory(self, territory):
+        self.territory = territory
+        output_dir = os.path.join(self.output_dir, str(territory.id))   
+        if not os.path.exists(output_dir):
+            os.makedirs(output_dir)
+        elif not self.resume:
+            subprocess.run(f"rm -rf {output_dir}/*", shell=True)
+
+        self.territory_output_dir = output_dir
+        self.tracer = Tracer(f"territory {territory.id}",
+                             profile_dir=os.path.join(output_dir, "_profile") if self.profile else None)
+        self.store = ArtifactStore(output_dir)
+        if self.assets_dir:
+            os.makedirs(self.assets_dir, exist_ok=True)
+            self.asset_store = ArtifactStore(self.assets_dir)
+        else:
+            self.asset_store = self.store
+
     def process(self, collection, territory, start_date, end_date, limit=1000):
         """
         Executa a sequência completa de etapas de montagem do mosaico.
@@ -306,22 +424,41 @@ class INPEImageAssembler(object):
         Este método pode ser chamado por um controlador externo que percorre
         diferentes territórios ou datas.
         """
-        self.territory = territory
-        
         print(f"Processing {collection} for territory {territory.id} from {start_date} to {end_date}")
-        output_dir = os.path.join(self.output_dir, str(territory.id))   
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        else:
-            subprocess.run(f"rm -rf {output_dir}/*", shell=True)
+        self._prepare_territory(territory)
+        with self.tracer.span("search", profile=True, collection=collection) as span:
+            self.search_scenes(collection, territory.geom, start_date, end_date, limit=limit)
+            span.set(scenes=len(self.items))
+        return self.process_items(territory, self.items)
 
-        self.territory_output_dir = output_dir
+    def process_items(self, territory, items):
+        """
+        Executa as etapas a partir de cenas já buscadas (ex.: busca única de um lote).
 
-        self.search_scenes(collection, territory.geom, start_date, end_date, limit=limit)
-        self.download_low_resolution_asset()
-        self.calculate_image_useful_area()
-        self.select_image_patches()
-        self.download_selected_patches()
+        items: lista de `pystac.Item` que intersectam o território.
+        """
+        if getattr(self, "territory", None) is not territory or self.store is None:
+            self._prepare_territory(territory)
+        self.items = sorted(items, key=lambda x: x.properties["datetime"], reverse=True)
+
+        tracer = self.tracer
+        # a área útil de cada cena é calculada assim que ela termina de baixar
+        with tracer.span("low_res", profile=True, scenes=len(self.items)):
+            self.download_low_resolution_asset(on_complete=self.calculate_scene_useful_area)
+        with tracer.span("selection", profile=True, candidates=len(self.assets)) as span:
+            self.select_image_patches()
+            span.set(selected=len(self.selected_images))
+        with tracer.span("high_res", profile=True, patches=len(self.selected_images)):
+            self.download_selected_patches()
         # self.calibrate_contrast_reference()
-        self.apply_contrast_to_all()
-        self.generate_mosaic()
+        with tracer.span("mosaic", profile=True):
+            self.build_mosaic()
+        print(f"Artifact cache: {dict(self.store.stats)}")
+        if self.prune:
+            removed = self.store.prune()
+            if self.asset_store is not self.store and self.asset_max_age is not None:
+                removed += self.asset_store.prune(older_than=self.asset_max_age)
+            print(f"Pruned {removed} stale artifacts")
+        tracer.write(os.path.join(self.territory_output_dir, "trace.json"))
+        print(tracer.summary())
+        return self.mosaic_path
@@ -0,0 +1,161 @@
+"""
+Mosaico dos trechos de alta resolução via VRT, com contraste aplicado em leitura.
+
+Substitui ``gdalenhance`` (um ``_enhance.tif`` por cena) + ``gdal_merge.py``:
+a LUT de contraste de cada data é calculada a partir de um histograma
+amostrado nas overviews, embutida como ``<LUT>`` nas ``ComplexSource`` de um
+VRT (na ordem de sobreposição) e o GDAL a aplica bloco a bloco enquanto grava
+um único COG.
+"""
+import os
+import re
+import tempfile
+from collections import defaultdict
+from xml.sax.saxutils import escape
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.shutil import copy as rio_copy
+
+
+DATE_PATTERN = re.compile(r'_(\d{8})_')
+
+
+def group_by_date(image_ids):
+    """Agrupa ids de cena pela data ``_AAAAMMDD_`` do nome (sem data -> None)."""
+    groups = defaultdict(list)
+    for img_id in image_ids:
+        m = DATE_PATTERN.search(img_id)
+        groups[m.group(1) if m else None].append(img_id)
+    return groups
+
+
+def sampled_histogram(paths, bands=3, max_side=1024):
+    """
+    Histograma (256 níveis, por banda) amostrado das imagens.
+
+    A leitura decimada (``out_shape``) usa as overviews quando existem, então
+    o custo independe do tamanho da imagem. O valor 0 (nodata) é ignorado.
+    """
+    hist = np.zeros((bands, 256), dtype=np.int64)
+    for path in paths:
+        with rasterio.open(path) as src:
+            factor = max(1, int(np.ceil(max(src.width, src.height) / max_side)))
+            shape = (bands, max(1, src.height // factor), max(1, src.width // factor))
+            data = src.read(list(range(1, bands + 1)), out_shape=shape, resampling=Resampling.nearest)
+        for b in range(bands):
+            hist[b] += np.bincount(data[b].ravel(), minlength=256)[:256]
+    hist[:, 0] = 0
+    return hist
+
+
+def contrast_lut(hist, p_low=1, p_high=99, gamma=2):
+    """
+    LUT 0..255 -> 0..255 por banda: estica [p_low, p_high] e aplica ``x ** (1/gamma)``.
+
+    0 continua 0 (nodata) e nenhum valor válido é levado a 0.
+    """
+    levels = np.arange(256, dtype=float)
+    luts = []
+    for band_hist in hist:
+        cdf = np.cumsum(band_hist) / max(1, band_hist.sum())
+        lo = int(np.searchsorted(cdf, p_low / 100))
+        hi = max(lo + 1, int(np.searchsorted(cdf, p_high / 100)))
+        x = np.clip((levels - lo) / (hi - lo), 0, 1) ** (1 / gamma)
+        lut = np.clip(np.round(x * 255), 1, 255).astype(np.uint8)
+        lut[0] = 0
+        luts.append(lut)
+    return np.stack(luts)
+
+
+def _grid(paths):
+    """Grade do mosaico: união dos limites na resolução da primeira imagem (como o gdal_merge)."""
+    bounds, res, crs = [], None, None
+    for path in paths:
+        with rasterio.open(path) as src:
+            bounds.append(src.bounds)
+            res = res or src.res
+            crs = crs or src.crs
+    left = min(b.left for b in bounds)
+    top = max(b.top for b in bounds)
+    right = max(b.right for b in bounds)
+    bottom = min(b.bottom for b in bounds)
+    width = int(round((right - left) / res[0]))
+    height = int(round((top - bottom) / res[1]))
+    return left, top, res, width, height, crs
+
+
+def build_vrt(paths, luts, vrt_path, bands=3):
+    """
+    Escreve um VRT com as imagens em ``paths`` (a última fica por cima).
+
+    luts: lista paralela a ``paths`` com a LUT (bands x 256) de cada imagem.
+    """
+    left, top, (xres, yres), width, height, crs = _grid(paths)
+    band_xml = []
+    for b in range(bands):
+        sources = []
+        for path, lut in zip(paths, luts):
+            with rasterio.open(path) as src:
+                xoff = (src.bounds.left - left) / xres
+                yoff = (top - src.bounds.top) / yres
+                xsize = src.width * src.res[0] / xres
+                ysize = src.height * src.res[1] / yres
+                src_w, src_h = src.width, src.height
+            lut_txt = ",".join(f"{i}:{v}" for i, v in enumerate(lut[b]))
+            sources.append(f"""
+      <ComplexSource>
+        <SourceFilename relativeToVRT="0">{escape(os.path.abspath(path))}</SourceFilename>
+        <SourceBand>{b + 1}</SourceBand>
+        <SrcRect xOff="0" yOff="0" xSize="{src_w}" ySize="{src_h}"/>
+        <DstRect xOff="{xoff:.6f}" yOff="{yoff:.6f}" xSize="{xsize:.6f}" ySize="{ysize:.6f}"/>
+        <NODATA>0</NODATA>
+        <LUT>{lut_txt}</LUT>
+      </ComplexSource>""")
+        band_xml.append(f"""
+  <VRTRasterBand dataType="Byte" band="{b + 1}">
+    <NoDataValue>0</NoDataValue>
+    <ColorInterp>{("Red", "Green", "Blue", "Undefined")[min(b, 3)]}</ColorInterp>{"".join(sources)}
+  </VRTRasterBand>""")
+
+    xml = f"""<VRTDataset rasterXSize="{width}" rasterYSize="{height}">
+  <SRS>{escape(crs.to_wkt())}</SRS>
+  <GeoTransform>{left!r}, {xres!r}, 0, {top!r}, 0, {-yres!r}</GeoTransform>{"".join(band_xml)}
+</VRTDataset>
+"""
+    with open(vrt_path, "w") as f:
+        f.write(xml)
+    return vrt_path
+
+
+def build_mosaic(paths_by_id, order, mosaic_path, p_low=1, p_high=99, gamma=2,
+                 compress="LZW", blocksize=512):
+    """
+    Gera o mosaico COG em uma única passada de escrita.
+
+    Args:
+        paths_by_id (dict): ``{img_id: caminho do _high_res.tif}``.
+        order (list): ordem de sobreposição (a última imagem fica por cima).
+        mosaic_path (str): COG de saída.
+
+    Returns:
+        str: ``mosaic_path``.
+    """
+    luts = {}
+    for _, ids in group_by_date(order).items():
+        lut = contrast_lut(sampled_histogram([paths_by_id[i] for i in ids]), p_low, p_high, gamma)
+        luts.update({i: lut for i in ids})
+
+    # VRT temporário: só existe durante a cópia para o COG
+    fd, vrt_path = tempfile.mkstemp(suffix=".vrt", dir=os.path.dirname(os.path.abspath(mosaic_path)))
+    os.close(fd)
+    try:
+        build_vrt([paths_by_id[i] for i in order], [luts[i] for i in order], vrt_path)
+        with rasterio.Env(GDAL_NUM_THREADS="ALL_CPUS", GDAL_CACHEMAX=512):
+            rio_copy(vrt_path, mosaic_path, driver="COG", COMPRESS=compress,
+                     BLOCKSIZE=blocksize, OVERVIEW_RESAMPLING="AVERAGE",
+                     BIGTIFF="IF_SAFER", NUM_THREADS="ALL_CPUS")
+    finally:
+        os.remove(vrt_path)
+    return mosaic_path
@@ -0,0 +1,332 @@
+"""
+Execução em lote do pipeline do vazio sanitário por unidade hidrográfica.
+
+Cada bacia passa por busca STAC -> empilhamento -> máscara -> índices ->
+redução temporal -> escrita dos GeoTIFFs -> carga dos índices no PostGIS raster
+(ver ``raster_ingest``) -> detecção de indícios de soja (carregados no PostGIS,
+ver ``change_detection``). As bacias são distribuídas em um
+pool de processos com concorrência limitada e cada bacia concluída grava um
+checkpoint, de modo que uma execução interrompida retoma de onde parou. O checkpoint
+guarda o hash dos parâmetros: mudar datas ou resolução reprocessa a bacia.
+
+Uso (a partir de ``notebooks/``):
+
+    python -m utils.pipeline --workers 4            # todas as bacias
+    python -m utils.pipeline 12 15 27 --force       # bacias específicas
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from .database import fetch_vector_from_postgres, pg_uri_from_env
+from .tracing import Tracer
+
+
+STAC_URL = "https://earth-search.aws.element84.com/v1"
+CHECKPOINT_FILE = "_SUCCESS.json"
+TRACE_FILE = "trace.json"
+
+BASIN_SQL = (
+    "SELECT id, luh_nm, ST_Envelope(geom) geom "
+    "FROM unidades_hidrograficas WHERE id = %(id)s"
+)
+ALL_BASINS_SQL = "SELECT id, luh_nm, ST_Envelope(geom) geom FROM unidades_hidrograficas ORDER BY id"
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+    """Parâmetros compartilhados por todas as bacias de uma execução."""
+
+    pg_uri: str
+    output_dir: str
+    vazio_start: str = "2025-07-01"
+    vazio_end: str = "2025-07-15"
+    baseline_start: str = "2025-03-15"
+    baseline_end: str = "2025-04-01"
+    stac_url: str = STAC_URL
+    s2_query: dict = field(default_factory=lambda: {"eo:cloud_cover": {"lt": 80}})
+    s1_query: dict = field(default_factory=lambda: {"sar:instrument_mode": {"eq": "IW"}})
+    pixel_res: int = 10  # metros
+    chunksize: int = 1024
+    detect_soja: bool = True
+    soja_thresholds: dict = field(default_factory=dict)
+    profile: bool = False  # cProfile por etapa em <bacia>/_profile
+    # índices carregados em PostGIS raster para séries temporais (dNDVI usa o período do vazio)
+    ingest_indices: tuple = ("NDVI_med", "dNDVI")
+
+
+# ---------- Checkpoints ----------
+
+def basin_output_dir(config, basin_id):
+    return os.path.join(config.output_dir, str(basin_id))
+
+
+# campos que não alteram os rasters gerados
+_RUN_ONLY_FIELDS = ("pg_uri", "output_dir", "profile")
+
+
+def config_hash(config):
+    """Hash dos parâmetros que determinam as saídas de uma bacia."""
+    params = {k: v for k, v in asdict(config).items() if k not in _RUN_ONLY_FIELDS}
+    return hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+def is_done(config, basin_id):
+    """Há checkpoint da bacia gerado com os mesmos parâmetros (datas, resolução...)."""
+    path = os.path.join(basin_output_dir(config, basin_id), CHECKPOINT_FILE)
+    if not os.path.exists(path):
+        return False
+    with open(path) as f:
+        return json.load(f).get("config_hash") == config_hash(config)
+
+
+def write_checkpoint(config, basin_id, outputs, elapsed, extra=None):
+    path = os.path.join(basin_output_dir(config, basin_id), CHECKPOINT_FILE)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump({
+            "basin_id": basin_id,
+            "finished_at": datetime.now().isoformat(timespec="seconds"),
+            "elapsed_s": round(elapsed, 2),
+            "outputs": outputs,
+            "config": asdict(config) | {"pg_uri": None},
+            "config_hash": config_hash(config),
+            **(extra or {}),
+        }, f, indent=2)
+    os.replace(tmp, path)  # o checkpoint só aparece completo
+
+
+# ---------- Etapas por bacia ----------
+
+def _search_window(config, collection, start, end, aoi, query):
+    from .PDI import search_stac
+
+    items = search_stac(config.stac_url, collection, start, end, aoi, {"query": query})
+    if not items:
+        raise RuntimeError(f"Nenhuma cena {collection} entre {start} e {end}.")
+    return items
+
+
+def _reduce_window(config, aoi, grid, start, end):
+    """Busca, empilha, mascara e reduz S2 e S1 de uma janela temporal."""
+    import xarray as xr
+    from .PDI import stack_s2, stack_s1, s2_mask_scale, s2_indices, s1_feats, reduce_period
+
+    s2_items = _search_window(config, "sentinel-2-l2a", start, end, aoi, config.s2_query)
+    s1_items = _search_window(config, "sentinel-1-grd", start, end, aoi, config.s1_query)
+
+    s2 = s2_mask_scale(stack_s2(s2_items, None, CHUNK=config.chunksize, grid=grid))
+    s1 = stack_s1(s1_items, None, chunksize=config.chunksize, grid=grid)
+
+    # quantile exige a dimensão time em um único chunk
+    s2_red = reduce_period(s2_indices(s2).chunk({"time": -1}))
+    s1_red = reduce_period(s1_feats(s1).chunk({"time": -1}))
+
+    # S1 e S2 já estão na mesma grade: o merge não reamostra nada
+    return xr.merge([s2_red, s1_red], compat="override", join="exact")
+
+
+def process_basin(config, basin_id):
+    """
+    Executa o pipeline completo para uma unidade hidrográfica.
+
+    Returns:
+        dict: caminhos dos GeoTIFFs gerados, indexados pelo nome da variável.
+    """
+    import dask
+    import xarray as xr
+    from .PDI import make_grid, save_cog
+
+    started = time.perf_counter()
+    out_dir = basin_output_dir(config, basin_id)
+    os.makedirs(out_dir, exist_ok=True)
+    tracer = Tracer(f"basin {basin_id}",
+                    profile_dir=os.path.join(out_dir, "_profile") if config.profile else None)
+
+    with tracer.span("fetch_basin", profile=True):
+        uh = fetch_vector_from_postgres(config.pg_uri, BASIN_SQL, params={"id": basin_id})
+    if uh.empty:
+        raise ValueError(f"Unidade hidrográfica {basin_id} não encontrada.")
+    aoi = uh.iloc[0].geom.__geo_interface__
+    grid = make_grid(uh.total_bounds.tolist(), config.pixel_res)
+
+    # busca STAC + montagem do grafo (sem leitura de pixels)
+    with tracer.span("graph_vazio", profile=True) as span:
+        vazio = _reduce_window(config, aoi, grid, config.vazio_start, config.vazio_end)
+        span.set_dask_tasks(vazio)
+    with tracer.span("graph_baseline", profile=True) as span:
+        baseline = _reduce_window(config, aoi, grid, config.baseline_start, config.baseline_end)
+        span.set_dask_tasks(baseline)
+
+    dndvi = (vazio["NDVI_med"] - baseline["NDVI_med"]).rename("dNDVI")
+    rasters = {f"vazio_{v}": vazio[v] for v in vazio.data_vars}
+    rasters |= {f"baseline_{v}": baseline[v] for v in baseline.data_vars}
+    rasters["dNDVI"] = dndvi
+
+    # um único compute compartilha leitura e máscara entre todas as saídas
+    names = list(rasters)
+    with tracer.span("compute", profile=True, outputs=len(names), shape=list(grid.shape)) as span:
+        span.set_dask_tasks(*[rasters[n] for n in names])
+        computed = dict(zip(names, dask.compute(*[rasters[n] for n in names])))
+
+    outputs = {}
+    with tracer.span("write_cogs", profile=True, outputs=len(computed)):
+        for name, arr in computed.items():
+            path = os.path.join(out_dir, f"{name}.tif")
+            save_cog(path, arr.values, arr.x.values, arr.y.values)
+            outputs[name] = path
+
+    extra = {}
+    if config.ingest_indices:
+        from .raster_ingest import ingest_index_raster
+
+        periods = {"vazio": (config.vazio_start, config.vazio_end),
+                   "baseline": (config.baseline_start, config.baseline_end)}
+        with tracer.span("ingest_rasters", profile=True) as span:
+            tiles = 0
+            for name, path in outputs.items():
+                period, _, index_name = name.partition("_")
+                if name == "dNDVI":
+                    period, index_name = "vazio", name
+                if index_name not in config.ingest_indices:
+                    continue
+                tiles += ingest_index_raster(config.pg_uri, path, basin_id, index_name, *periods[period])
+            span.set(tiles=tiles)
+        extra["raster_tiles"] = tiles
+
+    if config.detect_soja:
+        from .change_detection import run_change_detection
+
+        with tracer.span("change_detection", profile=True) as span:
+            vazio_np = xr.Dataset({v: computed[f"vazio_{v}"] for v in vazio.data_vars})
+            extra["indicios"] = run_change_detection(
+                config.pg_uri, vazio_np, computed["dNDVI"], basin_id,
+                run_date=datetime.now().date(), thresholds=config.soja_thresholds,
+            )
+            span.set(indicios=extra["indicios"])
+
+    extra["trace"] = tracer.write(os.path.join(out_dir, TRACE_FILE))
+    write_checkpoint(config, basin_id, outputs, time.perf_counter() - started, extra)
+    return outputs
+
+
+# ---------- Pool de processos ----------
+
+def _init_worker(threads_per_worker, memory_limit):
+    """Limita threads do dask/GDAL e, opcionalmente, a memória de cada worker."""
+    import dask
+
+    dask.config.set(scheduler="threads", num_workers=threads_per_worker)
+    os.environ["GDAL_NUM_THREADS"] = str(threads_per_worker)
+    if memory_limit:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit, memory_limit))
+
+
+def _run_one(config, basin_id):
+    try:
+        return basin_id, process_basin(config, basin_id), None
+    except Exception:
+        return basin_id, None, traceback.format_exc()
+
+
+def list_basin_ids(pg_uri):
+    uh = fetch_vector_from_postgres(pg_uri, ALL_BASINS_SQL)
+    return [int(i) for i in uh["id"]]
+
+
+def run_pipeline(config, basin_ids, workers=None, threads_per_worker=None,
+                 memory_limit=None, force=False):
+    """
+    Processa várias unidades hidrográficas em paralelo.
+
+    Args:
+        config (PipelineConfig): parâmetros da execução.
+        basin_ids (list): ids de ``unidades_hidrograficas``.
+        workers (int, opcional): processos simultâneos. Padrão: metade dos núcleos.
+        threads_per_worker (int, opcional): threads do dask por processo. Padrão:
+            núcleos divididos entre os workers.
+        memory_limit (int, opcional): limite de memória virtual por worker, em bytes.
+        force (bool): reprocessa bacias que já possuem checkpoint.
+
+    Returns:
+        dict: ``{"done": [...], "skipped": [...], "failed": {id: traceback}}``.
+    """
+    cpus = os.cpu_count() or 1
+    workers = workers or max(1, cpus // 2)
+    threads_per_worker = threads_per_worker or max(1, cpus // workers)
+
+    pending = [b for b in basin_ids if force or not is_done(config, b)]
+    report = {"done": [], "skipped": [b for b in basin_ids if b not in pending], "failed": {}}
+    if report["skipped"]:
+        print(f"Skipping {len(report['skipped'])} basins with checkpoint.")
+    if not pending:
+        return report
+
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(pending)),
+        initializer=_init_worker,
+        initargs=(threads_per_worker, memory_limit),
+        max_tasks_per_child=1,  # libera memória do GDAL/dask entre bacias
+    ) as pool:
+        futures = [pool.submit(_run_one, config, b) for b in pending]
+        for n, future in enumerate(as_completed(futures), start=1):
+            basin_id, _, error = future.result()
+            if error:
+                report["failed"][basin_id] = error
+                print(f"[{n}/{len(pending)}] basin {basin_id} failed:\n{error}")
+            else:
+                report["done"].append(basin_id)
+                print(f"[{n}/{len(pending)}] basin {basin_id} done.")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline do vazio sanitário em lote.")
+    parser.add_argument("basin_ids", nargs="*", type=int,
+                        help="ids de unidades_hidrograficas (padrão: todas)")
+    parser.add_argument("--output-dir", default="/tmp/vazio_sanitario")
+    parser.add_argument("--pg-uri", default=None, help="padrão: variáveis DB_*")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--threads-per-worker", type=int, default=None)
+    parser.add_argument("--memory-limit-gb", type=float, default=None)
+    parser.add_argument("--vazio", nargs=2, metavar=("INICIO", "FIM"))
+    parser.add_argument("--baseline", nargs=2, metavar=("INICIO", "FIM"))
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--no-detect", action="store_true",
+                        help="não gera/carrega os indícios de soja no PostGIS")
+    parser.add_argument("--no-ingest", action="store_true",
+                        help="não carrega os rasters de índice no PostGIS")
+    parser.add_argument("--profile", action="store_true",
+                        help="grava um cProfile por etapa em <bacia>/_profile")
+    args = parser.parse_args(argv)
+
+    kwargs = {"pg_uri": args.pg_uri or pg_uri_from_env(), "output_dir": args.output_dir,
+              "detect_soja": not args.no_detect, "profile": args.profile}
+    if args.no_ingest:
+        kwargs["ingest_indices"] = ()
+    if args.vazio:
+        kwargs["vazio_start"], kwargs["vazio_end"] = args.vazio
+    if args.baseline:
+        kwargs["baseline_start"], kwargs["baseline_end"] = args.baseline
+    config = PipelineConfig(**kwargs)
+
+    basin_ids = args.basin_ids or list_basin_ids(config.pg_uri)
+    memory_limit = int(args.memory_limit_gb * 1024**3) if args.memory_limit_gb else None
+    report = run_pipeline(config, basin_ids, workers=args.workers,
+                          threads_per_worker=args.threads_per_worker,
+                          memory_limit=memory_limit, force=args.force)
+    print(f"Done: {len(report['done'])} | skipped: {len(report['skipped'])} | failed: {len(report['failed'])}")
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
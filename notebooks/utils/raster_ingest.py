@@ -0,0 +1,117 @@
+"""
+Carga dos rasters de índice reduzidos no PostGIS raster para séries temporais.
+
+Cada saída do pipeline (um índice, um período, uma bacia) é cortada em tiles de
+``tile`` x ``tile`` pixels e gravada na tabela ``index_rasters`` junto com
+overviews (médias em blocos de ``factor`` x ``factor``, coluna
+``overview_factor``). Os tiles são codificados direto no formato WKB do PostGIS
+raster e enviados via ``COPY``, substituindo apenas as linhas da mesma bacia,
+índice e período. A API consulta essa tabela (ver ``/api/v1/timeseries``)
+sem reprocessar as imagens.
+
+O esquema da tabela e seus índices são criados pelo banco na inicialização
+(``infra/docker/db/initdb.d/03_index_rasters.sql``).
+"""
+from __future__ import annotations
+
+import io
+import struct
+import warnings
+
+import numpy as np
+import rasterio
+from rasterio.transform import Affine
+
+from .database import copy_rows, get_engine
+
+
+INDEX_RASTERS_TABLE = "index_rasters"
+NODATA = -9999.0
+PT_32BF = 10            # float32 no formato WKB do PostGIS raster
+BAND_HAS_NODATA = 0x40
+
+
+def raster_wkb(array, transform, srid=4326, nodata=NODATA):
+    """Codifica uma banda float32 como WKB (hex) do PostGIS raster."""
+    h, w = array.shape
+    data = np.where(np.isnan(array), nodata, array).astype("<f4")
+    header = struct.pack(
+        "<BHHddddddiHH", 1, 0, 1,
+        transform.a, transform.e, transform.c, transform.f, transform.b, transform.d,
+        srid, w, h,
+    )
+    band = struct.pack("<Bf", BAND_HAS_NODATA | PT_32BF, nodata)
+    return (header + band + data.tobytes()).hex()
+
+
+def block_mean(array, factor):
+    """Média (ignorando NaN) em blocos ``factor`` x ``factor``; bordas completadas com NaN."""
+    if factor == 1:
+        return array
+    h, w = array.shape
+    padded = np.full((-(-h // factor) * factor, -(-w // factor) * factor), np.nan, dtype="float32")
+    padded[:h, :w] = array
+    blocks = padded.reshape(padded.shape[0] // factor, factor, padded.shape[1] // factor, factor)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # blocos só com NaN
+        return np.nanmean(blocks, axis=(1, 3))
+
+
+def raster_tiles(array, transform, tile=256, factors=(1, 4, 16), srid=4326):
+    """
+    Gera ``(overview_factor, wkb_hex)`` para cada tile com algum dado válido.
+    """
+    array = np.asarray(array, dtype="float32")
+    for factor in factors:
+        level = block_mean(array, factor)
+        level_transform = transform * Affine.scale(factor)
+        h, w = level.shape
+        for row in range(0, h, tile):
+            for col in range(0, w, tile):
+                block = level[row:row + tile, col:col + tile]
+                if np.isnan(block).all():
+                    continue
+                yield factor, raster_wkb(block, level_transform * Affine.translation(col, row), srid)
+
+
+def ingest_index_raster(connection_uri, path, basin_id, index_name, period_start, period_end,
+                        table=INDEX_RASTERS_TABLE, tile=256, factors=(1, 4, 16)):
+    """
+    Substitui os tiles de (bacia, índice, período) em ``table`` em uma única transação.
+
+    Args:
+        path (str): GeoTIFF/COG de uma banda gerado pelo pipeline (EPSG:4326).
+        period_start, period_end (str | date): janela temporal da redução.
+
+    Returns:
+        int: quantidade de tiles gravados (todas as overviews).
+    """
+    with rasterio.open(path) as src:
+        array = src.read(1, masked=True).astype("float32").filled(np.nan)
+        transform = src.transform
+        srid = src.crs.to_epsg() or 4326
+
+    buffer = io.StringIO()
+    count = 0
+    for factor, wkb in raster_tiles(array, transform, tile=tile, factors=factors, srid=srid):
+        buffer.write(f"{basin_id}\t{index_name}\t{period_start}\t{period_end}\t{factor}\t{wkb}\n")
+        count += 1
+    buffer.seek(0)
+
+    conn = get_engine(connection_uri).raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            f"DELETE FROM {table} WHERE basin_id = %(basin_id)s AND index_name = %(index_name)s "
+            "AND period_start = %(start)s AND period_end = %(end)s",
+            {"basin_id": basin_id, "index_name": index_name, "start": period_start, "end": period_end},
+        )
+        copy_rows(cur, f"COPY {table} (basin_id, index_name, period_start, period_end, "
+                        "overview_factor, rast) FROM STDIN", buffer)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+    return count
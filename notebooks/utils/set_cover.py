@@ -0,0 +1,115 @@
+"""
+Cobertura gulosa de conjuntos (set cover) para a seleção de cenas.
+
+Cada célula H3 recebe um índice inteiro e cada cena vira um bitset (``int`` do
+Python, com popcount nativo). A escolha usa o guloso "preguiçoso": os ganhos
+ficam numa fila de prioridade e só são recalculados quando a cena chega ao
+topo, já que o ganho de uma cena nunca aumenta ao longo da seleção.
+"""
+import heapq
+from datetime import datetime
+
+import numpy as np
+
+
+def index_cells(candidates):
+    """
+    Converte ``{id: células}`` em ``(universo, {id: array de índices})``.
+
+    O universo é o array das células distintas; os índices apontam para
+    posições nele. Células em arrays inteiros (H3 int64) são indexadas com
+    ``np.unique``; strings H3 usam um dict, evitando ordenar strings.
+    """
+    values = list(candidates.values())
+    if values and all(isinstance(v, np.ndarray) and v.dtype.kind in "iu" for v in values):
+        sizes = np.cumsum([len(v) for v in values])[:-1]
+        universe, inverse = np.unique(np.concatenate(values), return_inverse=True)
+        return universe, dict(zip(candidates, np.split(inverse, sizes)))
+
+    universe = list(set().union(*values))
+    index = dict(zip(universe, range(len(universe))))
+    out = {}
+    for k, cells in candidates.items():
+        out[k] = np.fromiter(map(index.__getitem__, cells), dtype=np.int64, count=len(cells))
+    return np.array(universe, dtype=object), out
+
+
+def to_bitset(indices, n_bits):
+    """Bitset (``int``) com os bits ``indices`` ligados."""
+    bits = np.zeros(n_bits, dtype=bool)
+    bits[indices] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def from_bitset(bitset, universe):
+    """Células do universo correspondentes aos bits ligados."""
+    n_bytes = (len(universe) + 7) // 8
+    raw = np.frombuffer(bitset.to_bytes(n_bytes, "little"), dtype=np.uint8)
+    bits = np.unpackbits(raw, bitorder="little")[:len(universe)].astype(bool)
+    return set(universe[bits].tolist())
+
+
+def greedy_set_cover(candidates, weights=None):
+    """
+    Seleciona cenas até cobrir todas as células cobertas por alguma candidata.
+
+    Args:
+        candidates (dict): ``{id: iterável de células}``.
+        weights (dict, opcional): ``{id: peso > 0}``; o critério passa a ser
+            ``novas células x peso``. Sem pesos equivale ao guloso clássico.
+            Empates são desfeitos pela ordem do id.
+
+    Returns:
+        tuple: (ordem de seleção, ``{id: células atribuídas à cena}``).
+    """
+    universe, indices = index_cells(candidates)
+    n = len(universe)
+    bitsets = {k: to_bitset(idx, n) for k, idx in indices.items()}
+    weights = weights or {}
+
+    uncovered = (1 << n) - 1
+    heap = [(-(b.bit_count() * weights.get(k, 1.0)), k) for k, b in bitsets.items() if b]
+    heapq.heapify(heap)
+
+    order, assignment = [], {}
+    while uncovered and heap:
+        _, k = heapq.heappop(heap)
+        gain_bits = bitsets[k] & uncovered
+        score = gain_bits.bit_count() * weights.get(k, 1.0)
+        if not score:
+            continue
+        # (ganho, id) recalculado ainda é o melhor? então seleciona; senão volta à
+        # fila. As entradas na fila são limites superiores, então um empate com
+        # id menor no topo precisa ser reavaliado antes.
+        if heap and (-score, k) > heap[0]:
+            heapq.heappush(heap, (-score, k))
+            continue
+        order.append(k)
+        assignment[k] = from_bitset(gain_bits, universe)
+        uncovered &= ~gain_bits
+    return order, assignment
+
+
+def scene_weights(items, by=("date", "cloud"), half_life_days=30.0):
+    """
+    Pesos por cena a partir das propriedades STAC.
+
+    date: cenas mais recentes pesam mais (meia-vida de ``half_life_days``).
+    cloud: peso proporcional a ``1 - eo:cloud_cover/100``.
+    """
+    if not items:
+        return {}
+    dates = {i.id: datetime.fromisoformat(i.properties["datetime"].replace("Z", "+00:00")) for i in items}
+    newest = max(dates.values())
+    weights = {}
+    for i in items:
+        w = 1.0
+        if "date" in by:
+            age = (newest - dates[i.id]).total_seconds() / 86400
+            w *= 0.5 ** (age / half_life_days)
+        if "cloud" in by:
+            cloud = i.properties.get("eo:cloud_cover")
+            if cloud is not None:
+                w *= max(1e-3, 1 - cloud / 100)
+        weights[i.id] = w
+    return weights
@@ -0,0 +1,77 @@
+"""
+Backends de armazenamento para os produtos finais (mosaicos).
+
+``S3Storage`` envia para um bucket S3 (ou MinIO, via ``endpoint_url``);
+``LocalStorage`` copia para um diretório local e serve como substituto em
+testes e desenvolvimento. ``storage_from_env`` escolhe pelo ambiente.
+"""
+import os
+import shutil
+from abc import ABC, abstractmethod
+
+
+class Storage(ABC):
+    """Interface mínima: ``upload(arquivo_local, chave)`` -> URI do objeto."""
+
+    @abstractmethod
+    def upload(self, local_path, key):
+        """Envia ``local_path`` para ``key`` e devolve a URI do objeto."""
+
+
+class LocalStorage(Storage):
+    """
+    Grava os objetos em ``root/<chave>`` (substituto local do S3).
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def upload(self, local_path, key):
+        dest = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp = f"{dest}.tmp"
+        shutil.copyfile(local_path, tmp)
+        os.replace(tmp, dest)
+        return dest
+
+    def __repr__(self):
+        return f"LocalStorage({self.root!r})"
+
+
+class S3Storage(Storage):
+    """
+    Bucket S3 ou compatível (MinIO: informe ``endpoint_url``).
+
+    O cliente boto3 é criado sob demanda e não é serializado, para que a
+    instância possa ser enviada a processos de um pool.
+    """
+    def __init__(self, bucket, endpoint_url=None):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import boto3
+            self._client = boto3.client('s3', endpoint_url=self.endpoint_url)
+        return self._client
+
+    def upload(self, local_path, key):
+        self.client.upload_file(local_path, self.bucket, key)
+        return f"s3://{self.bucket}/{key}"
+
+    def __repr__(self):
+        return f"S3Storage({self.bucket!r}, endpoint_url={self.endpoint_url!r})"
+
+    def __getstate__(self):
+        return {**self.__dict__, "_client": None}
+
+
+def storage_from_env():
+    """
+    ``STORAGE_DIR`` definido -> ``LocalStorage``; senão ``S3Storage`` com
+    ``BUCKET_NAME`` e ``S3_ENDPOINT_URL`` (opcional, para MinIO).
+    """
+    if os.environ.get("STORAGE_DIR"):
+        return LocalStorage(os.environ["STORAGE_DIR"])
+    return S3Storage(os.environ["BUCKET_NAME"], endpoint_url=os.environ.get("S3_ENDPOINT_URL"))
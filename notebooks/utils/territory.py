@@ -1,3 +1,7 @@
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
 PAPER_SIZE = { #orientation: (width, height) in mm. Default is portrait
     "A4": (210, 297),  # mm
     "A3": (297, 420),  # mm
@@ -10,6 +14,40 @@ PORTRAIT = "portrait"
 LANDSCAPE = "landscape"
 
 
+def paper_dimensions(paper_size):
+    """
+    Dimensões e orientação de um formato de papel.
+
+    Args:
+        paper_size (str or tuple): Nome do formato ('A4', 'A3', etc.) ou tupla (largura, altura) em mm.
+
+    Returns:
+        tuple: ((largura, altura) em mm, orientação).
+
+    Raises:
+        ValueError: Se o nome do formato for inválido.
+    """
+    if isinstance(paper_size, tuple) and len(paper_size) == 2:
+        dimensions = paper_size
+    elif isinstance(paper_size, str):
+        paper_size = paper_size.upper()
+        if paper_size in PAPER_SIZE:
+            dimensions = PAPER_SIZE[paper_size]
+        else:
+            raise ValueError(f"Invalid paper size: {paper_size}. Available sizes: {list(PAPER_SIZE.keys())}")
+    else:
+        raise ValueError("paper_size must be a tuple (width, height) in mm or a valid paper size string (e.g., 'A4').")
+
+    orientation = PORTRAIT
+    if paper_size[0] > paper_size[1]:
+        orientation = LANDSCAPE
+    return dimensions, orientation
+
+
+def mm_to_px(mm, dpi):
+    """Converte milímetros para pixels com base no DPI."""
+    return round(mm / 25.4 * dpi)
+
 
 class Territory(object):
     """
@@ -55,15 +93,8 @@ class Territory(object):
         Atribui atributos como `bbox`, `minx`, `miny`, `maxx`, `maxy`,
         além de `width` e `height` do território.
         """        
-        def extrair_coords(coords):
-            if isinstance(coords[0], (int, float)):
-                return [coords]
-            return [p for c in coords for p in extrair_coords(c)]
-
-        pontos = extrair_coords(self.geom["coordinates"])
-        xs, ys = zip(*pontos)
-
-        self.bbox = [min(xs), min(ys), max(xs), max(ys)]
+        # limites calculados em C pelo shapely, sem achatar as coordenadas em listas
+        self.bbox = [float(v) for v in shapely.bounds(shape(self.geom))]
         self.minx, self.miny, self.maxx, self.maxy = self.bbox
         self.width = self.maxx - self.minx
         self.height = self.maxy - self.miny
@@ -79,21 +110,7 @@ class Territory(object):
         Raises:
             ValueError: Se o nome do formato for inválido.
         """
-        if isinstance(paper_size, tuple) and len(paper_size) == 2:
-            self.paper_size = paper_size            
-        elif isinstance(paper_size, str):
-            paper_size = paper_size.upper()
-            if paper_size in PAPER_SIZE:
-                self.paper_size = PAPER_SIZE[paper_size]
-            else:
-                raise ValueError(f"Invalid paper size: {paper_size}. Available sizes: {list(PAPER_SIZE.keys())}")
-        else:
-            raise ValueError("paper_size must be a tuple (width, height) in mm or a valid paper size string (e.g., 'A4').")
-        
-        self.orientation = PORTRAIT
-        if paper_size[0] > paper_size[1]:
-            self.orientation = LANDSCAPE
-            # self.paper_size = (self.paper_size[1], self.paper_size[0])  # Swap width and height for landscape
+        self.paper_size, self.orientation = paper_dimensions(paper_size)
 
 
     def calculate_printing_variables(self):
@@ -140,6 +157,40 @@ class Territory(object):
         self.pixel_size_y = (self.maxy_optimum - self.miny_optimum) / self.paper_height_px
 
 
+    def hex_centres(self, resolution=8, cache=None):
+        """
+        Retorna as células H3 que cobrem o envelope de impressão (`bbox_optimum`)
+        e os seus centros.
+
+        O resultado vem do cache de cobertura compartilhado (chave: hash da
+        geometria + resolução), então o montador de mosaicos não recalcula a
+        cobertura a cada cena.
+
+        Args:
+            resolution (int, opcional): Resolução H3. Padrão: 8.
+            cache (H3CoverageCache, opcional): Cache a usar. Padrão: cache global.
+
+        Returns:
+            tuple: (células int64 ordenadas, latitudes, longitudes), alinhados por posição.
+        """
+        from .h3_cache import get_coverage_cache
+        cache = cache or get_coverage_cache()
+        return cache.centres(self.bbox_optimum, resolution)
+
+    def pixels_for(self, bbox):
+        """
+        Tamanho em pixels de papel de um trecho ``[minx, miny, maxx, maxy]``.
+
+        Usa o tamanho de pixel do envelope de impressão, de modo que os trechos
+        de alta resolução encaixam na grade do mosaico do território.
+
+        Returns:
+            tuple: (largura_px, altura_px), no mínimo 1.
+        """
+        minx, miny, maxx, maxy = bbox
+        return (max(1, round((maxx - minx) / self.pixel_size_x)),
+                max(1, round((maxy - miny) / self.pixel_size_y)))
+
     def mm_to_px(self, mm):
         """
         Converte um valor de milímetros para pixels com base no DPI.
@@ -150,7 +201,7 @@ class Territory(object):
         Returns:
             int: Valor correspondente em pixels.
         """
-        return round(mm / 25.4 * self.dpi)
+        return mm_to_px(mm, self.dpi)
 
     def __str__(self):
         return (
@@ -162,4 +213,105 @@ class Territory(object):
             f"  - Resolução: {self.paper_width_px} x {self.paper_height_px} px\n"
             f"  - Tamanho do pixel: {self.pixel_size_x:.6f} x {self.pixel_size_y:.6f} unidades/px\n"
             f"  - BBox otimizada: [{self.minx_optimum:.4f}, {self.miny_optimum:.4f}, {self.maxx_optimum:.4f}, {self.maxy_optimum:.4f}]"
-        )
\ No newline at end of file
+        )
+
+
+def optimum_envelopes(bounds, paper_size, offset=0.05):
+    """
+    Versão vetorizada de `Territory.calculate_printing_variables`.
+
+    Args:
+        bounds (np.ndarray): limites (n, 4) [minx, miny, maxx, maxy].
+        paper_size (str or tuple): formato do papel, como em `Territory`.
+        offset (float): margem relativa.
+
+    Returns:
+        np.ndarray: envelopes de impressão (n, 4).
+    """
+    (paper_width_mm, paper_height_mm), orientation = paper_dimensions(paper_size)
+    aspect = paper_width_mm / paper_height_mm
+    width = bounds[:, 2] - bounds[:, 0]
+    height = bounds[:, 3] - bounds[:, 1]
+    if orientation == PORTRAIT:
+        new_width = width * (1 + 2 * offset)
+        new_height = new_width / aspect
+    else:
+        new_height = height * (1 + 2 * offset)
+        new_width = new_height * aspect
+    cx = (bounds[:, 0] + bounds[:, 2]) / 2
+    cy = (bounds[:, 1] + bounds[:, 3]) / 2
+    return np.column_stack([cx - new_width / 2, cy - new_height / 2,
+                            cx + new_width / 2, cy + new_height / 2])
+
+
+class TerritoryCollection(object):
+    """
+    Conjunto de territórios com os atributos de `Territory` em arrays numpy.
+
+    Limites, envelopes de impressão e tamanhos de pixel de milhares de
+    geometrias são calculados de uma vez com shapely 2 / numpy; um `Territory`
+    completo só é criado ao acessar um item (``collection[i]``).
+
+    Atributos:
+        ids (np.ndarray): identificadores.
+        geoms (np.ndarray): geometrias shapely.
+        bounds (np.ndarray): (n, 4) [minx, miny, maxx, maxy].
+        bounds_optimum (np.ndarray): (n, 4) envelopes de impressão.
+        pixel_size_x, pixel_size_y (np.ndarray): tamanho do pixel em unidades de coordenada.
+        paper_size (tuple), orientation (str), paper_width_px, paper_height_px (int):
+            comuns a todos os territórios.
+    """
+    def __init__(self, ids, geoms, offset=0.05, paper_size="A4", dpi=100):
+        """
+        Args:
+            ids (array-like): identificadores dos territórios.
+            geoms (array-like): geometrias shapely (ex.: ``gdf.geometry.values``).
+            offset, paper_size, dpi: como em `Territory`.
+        """
+        self.ids = np.asarray(ids)
+        self.geoms = np.asarray(geoms, dtype=object)
+        if len(self.ids) != len(self.geoms):
+            raise ValueError("ids and geoms must have the same length")
+        self.offset = offset
+        self.dpi = dpi
+
+        self.paper_size, self.orientation = paper_dimensions(paper_size)
+        self.paper_width_px = mm_to_px(self.paper_size[0], dpi)
+        self.paper_height_px = mm_to_px(self.paper_size[1], dpi)
+        self._paper_size_arg = paper_size
+
+        self.bounds = shapely.bounds(self.geoms)
+        self.bounds_optimum = optimum_envelopes(self.bounds, paper_size, offset)
+        self.pixel_size_x = (self.bounds_optimum[:, 2] - self.bounds_optimum[:, 0]) / self.paper_width_px
+        self.pixel_size_y = (self.bounds_optimum[:, 3] - self.bounds_optimum[:, 1]) / self.paper_height_px
+
+    @classmethod
+    def from_geodataframe(cls, gdf, id_column=None, **kwargs):
+        """
+        Cria a coleção a partir de um GeoDataFrame (índice ou ``id_column`` como id).
+        """
+        ids = gdf.index.to_numpy() if id_column is None else gdf[id_column].to_numpy()
+        return cls(ids, gdf.geometry.values, **kwargs)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def id_list(self):
+        """Identificadores como objetos Python (``int``/``str``), não escalares numpy."""
+        return self.ids.tolist()
+
+    def territory_kwargs(self, i):
+        """Argumentos de `Territory` da posição ``i`` (serializáveis, para outro processo)."""
+        return {"id": self.ids[i:i + 1].tolist()[0], "geom": mapping(self.geoms[i]),
+                "offset": self.offset, "paper_size": self._paper_size_arg, "dpi": self.dpi}
+
+    def __getitem__(self, i):
+        """Materializa o `Territory` da posição ``i``."""
+        return Territory(**self.territory_kwargs(i))
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def envelopes(self):
+        """Envelopes de impressão como array de polígonos shapely."""
+        return shapely.box(*self.bounds_optimum.T)
@@ -0,0 +1,170 @@
+"""
+Rastreamento leve por etapa para o montador de mosaicos e o pipeline de índices.
+
+Cada ``span`` registra tempo de parede, CPU do processo e dos subprocessos
+(gdalwarp etc.), bytes lidos/escritos (``/proc/self/io``, que no Linux já soma
+os subprocessos encerrados), além de atributos livres como a quantidade de
+tarefas de um grafo dask. Os spans são aninhados por thread e gravados como
+JSON; opcionalmente cada etapa é perfilada com ``cProfile``.
+
+Uso:
+
+    tracer = Tracer("territorio 42")
+    with tracer.span("low_res", scenes=10) as span:
+        ...
+        span.set(failed=0)
+    tracer.write("trace.json")
+"""
+import cProfile
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+
+
+def _io_counters():
+    """(bytes lidos, bytes escritos) do processo; zeros fora do Linux."""
+    try:
+        with open("/proc/self/io") as f:
+            fields = dict(line.split(": ") for line in f.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return 0, 0
+
+
+def _snapshot():
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    read, written = _io_counters()
+    return {
+        "wall": time.perf_counter(),
+        "cpu": time.process_time(),
+        "children_cpu": children.ru_utime + children.ru_stime,
+        "bytes_read": read,
+        "bytes_written": written,
+    }
+
+
+def dask_task_count(*collections):
+    """Quantidade de tarefas nos grafos das coleções dask (objetos sem grafo contam 0)."""
+    total = 0
+    for c in collections:
+        graph = getattr(c, "__dask_graph__", lambda: None)()
+        total += len(graph) if graph is not None else 0
+    return total
+
+
+class Span(object):
+    """Um intervalo medido; ``set(**attrs)`` adiciona atributos ao registro."""
+
+    def __init__(self, name, span_id, parent_id, attrs):
+        self.name = name
+        self.id = span_id
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.thread = threading.current_thread().name
+        self.start_time = time.time()
+        self.metrics = {}
+        self.error = None
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def set_dask_tasks(self, *collections):
+        self.attrs["dask_tasks"] = dask_task_count(*collections)
+
+    def to_dict(self):
+        return {
+            "name": self.name, "id": self.id, "parent_id": self.parent_id,
+            "thread": self.thread, "start_time": self.start_time,
+            **self.metrics, "attrs": self.attrs, "error": self.error,
+        }
+
+
+class Tracer(object):
+    """
+    Coleta spans de uma execução (um território, uma bacia...).
+
+    Atributos:
+        name (str): nome da execução, gravado no JSON.
+        profile_dir (str | None): se definido, cada span de etapa (``profile=True``)
+            roda sob ``cProfile`` e o ``.prof`` é salvo nesse diretório.
+        spans (list): spans concluídos, na ordem de término.
+
+    Notas:
+        Métricas de CPU e bytes são do processo inteiro: spans simultâneos em
+        threads (downloads) se sobrepõem e não devem ser somados.
+    """
+    def __init__(self, name, profile_dir=None):
+        self.name = name
+        self.profile_dir = profile_dir
+        self.spans = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._root_stack = self._stack()  # spans em threads de pool herdam desta pilha
+
+    def _stack(self):
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def span(self, name, profile=False, **attrs):
+        stack = self._stack()
+        parents = stack or self._root_stack
+        with self._lock:
+            self._next_id += 1
+            span = Span(name, self._next_id, parents[-1].id if parents else None, attrs)
+
+        profiler = None
+        if profile and self.profile_dir:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        before = _snapshot()
+        stack.append(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            stack.pop()
+            after = _snapshot()
+            span.metrics = {k: round(after[k] - before[k], 6) if k in ("wall", "cpu", "children_cpu")
+                            else after[k] - before[k] for k in after}
+            if profiler is not None:
+                profiler.disable()
+                os.makedirs(self.profile_dir, exist_ok=True)
+                path = os.path.join(self.profile_dir, f"{span.id:04d}_{name}.prof")
+                profiler.dump_stats(path)
+                span.attrs["profile"] = path
+            with self._lock:
+                self.spans.append(span)
+
+    def to_dict(self):
+        return {"trace": self.name, "spans": [s.to_dict() for s in self.spans]}
+
+    def write(self, path):
+        """Grava o trace em JSON (atômico)."""
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.to_dict(), f, indent=1, default=str)
+        os.replace(tmp, path)
+        return path
+
+    def summary(self, depth=1):
+        """Tabela dos spans até ``depth`` níveis, do mais lento para o mais rápido."""
+        levels = {}
+        for s in sorted(self.spans, key=lambda s: s.id):
+            levels[s.id] = 0 if s.parent_id is None else levels.get(s.parent_id, 0) + 1
+        rows = [s for s in self.spans if levels[s.id] < depth]
+        lines = [f"{'span':<24}{'wall s':>9}{'cpu s':>9}{'child s':>9}{'read MB':>10}{'write MB':>10}"]
+        for s in sorted(rows, key=lambda s: -s.metrics["wall"]):
+            m = s.metrics
+            lines.append(
+                f"{s.name:<24}{m['wall']:>9.2f}{m['cpu']:>9.2f}{m['children_cpu']:>9.2f}"
+                f"{m['bytes_read'] / 2**20:>10.1f}{m['bytes_written'] / 2**20:>10.1f}"
+            )
+        return "\n".join(lines)
@@ -0,0 +1,59 @@
+"""
+Análise de área útil das cenas em memória, sem gdal_calc/gdal_polygonize.
+
+As máscaras de footprint e área útil são calculadas com numpy sobre o raster de
+baixa resolução e cada hexágono H3 da AOI é testado pelo pixel que contém o seu
+centro (mesmo critério de centróide usado por ``geo_to_cells``).
+"""
+import numpy as np
+import rasterio
+
+
+BRIGHT_THRESHOLD = 125  # RGB acima disso nas 3 bandas = nuvem/saturação
+
+
+def scene_masks(low_res_path):
+    """
+    Lê as 3 bandas do TCI de baixa resolução e devolve as máscaras.
+
+    Returns:
+        tuple: (footprint, areautil, transform), máscaras booleanas 2D.
+            footprint: pixels com dado nas três bandas.
+            areautil: footprint sem os pixels claros (nuvem).
+    """
+    with rasterio.open(low_res_path) as src:
+        rgb = src.read([1, 2, 3])
+        transform = src.transform
+    footprint = (rgb > 0).all(axis=0)
+    bright = (rgb > BRIGHT_THRESHOLD).all(axis=0)
+    return footprint, footprint & ~bright, transform
+
+
+def sample_mask(mask, transform, lat, lng):
+    """Valor da máscara no pixel que contém cada ponto (fora do raster = False)."""
+    inv = ~transform
+    cols = np.floor(inv.a * lng + inv.b * lat + inv.c).astype(np.int64)
+    rows = np.floor(inv.d * lng + inv.e * lat + inv.f).astype(np.int64)
+    h, w = mask.shape
+    inside = (rows >= 0) & (rows < h) & (cols >= 0) & (cols < w)
+    out = np.zeros(lat.shape, dtype=bool)
+    out[inside] = mask[rows[inside], cols[inside]]
+    return out
+
+
+def useful_area_hexes(low_res_path, cells, lat, lng):
+    """
+    Hexágonos da AOI cobertos pelo footprint e pela área útil de uma cena.
+
+    Args:
+        low_res_path (str): TCI de baixa resolução (EPSG:4326).
+        cells (np.ndarray): células H3 da AOI (int64, ver ``h3_cache``).
+        lat, lng (np.ndarray): centros das células.
+
+    Returns:
+        tuple: (footprint_hexes, areautil_hexes) como arrays int64 ordenados.
+    """
+    footprint, areautil, transform = scene_masks(low_res_path)
+    in_footprint = sample_mask(footprint, transform, lat, lng)
+    in_areautil = sample_mask(areautil, transform, lat, lng)
+    return cells[in_footprint], cells[in_areautil]
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import os
+import re
+import shlex
+import subprocess
+from datetime import date
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Literal
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, ValidationError
+from sqlalchemy.sql.elements import TextClause
+
+from app.api.v1.endpoints.imoveis import IMOVEIS_COM_INDICIOS_DE_SOJA_GEOJSON_SQL, IMOVEIS_GEOJSON_SQL
+from app.api.v1.endpoints.soja import INDICIO_SOJA_GEOJSON_SQL, SOJA_GEOJSON_SQL
+from app.core.config import get_settings
+from app.db.session import db_session
+from app.services.jobs import SUCCEEDED, JobActive, JobManager, JobNotFound, JobRecord, JobStore
+
+router = APIRouter()
+settings = get_settings()
+
+EXPORTS: dict[str, TextClause] = {
+    "imoveis": IMOVEIS_GEOJSON_SQL,
+    "imoveis_com_indicios_de_soja": IMOVEIS_COM_INDICIOS_DE_SOJA_GEOJSON_SQL,
+    "soja": SOJA_GEOJSON_SQL,
+    "indicio_de_soja": INDICIO_SOJA_GEOJSON_SQL,
+}
+
+
+class ExportParams(BaseModel):
+    layer: Literal["imoveis", "imoveis_com_indicios_de_soja", "soja", "indicio_de_soja"]
+
+
+class PipelineParams(BaseModel):
+    basin_ids: list[int] = []
+    vazio: tuple[date, date] | None = None
+    baseline: tuple[date, date] | None = None
+    detect_soja: bool = True
+
+
+PARAMS = {"export": ExportParams, "pipeline": PipelineParams}
+
+
+class JobRequest(BaseModel):
+    kind: Literal["export", "pipeline"]
+    params: dict[str, Any] = {}
+    force: bool = False
+
+
+class JobStatus(BaseModel):
+    id: str
+    kind: str
+    params: dict[str, Any]
+    status: str
+    created_at: float
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    artifact_url: str | None = None
+
+
+def run_export(params: dict[str, Any], workdir: Path) -> tuple[str, str]:
+    """Write a full-layer GeoJSON export to the job directory."""
+    name = f"{params['layer']}.geojson"
+    with db_session() as db:
+        result = db.execute(EXPORTS[params["layer"]]).scalar_one_or_none()
+    tmp = workdir / f"{name}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(result or {"type": "FeatureCollection", "features": []}, f)
+    os.replace(tmp, workdir / name)
+    return name, "application/geo+json"
+
+
+def run_pipeline(params: dict[str, Any], workdir: Path) -> tuple[str, str]:
+    """Run the batch index pipeline in a subprocess and report the per-basin checkpoints."""
+    output_dir = workdir / "outputs"
+    cmd = [*shlex.split(settings.pipeline_command), *map(str, params["basin_ids"]),
+           "--output-dir", str(output_dir), "--pg-uri", settings.database_url]
+    if params["vazio"]:
+        cmd += ["--vazio", *params["vazio"]]
+    if params["baseline"]:
+        cmd += ["--baseline", *params["baseline"]]
+    if not params["detect_soja"]:
+        cmd.append("--no-detect")
+
+    with open(workdir / "pipeline.log", "w") as log:
+        proc = subprocess.run(cmd, cwd=settings.pipeline_workdir, stdout=log, stderr=subprocess.STDOUT)
+
+    report = {
+        path.parent.name: json.loads(path.read_text())
+        for path in sorted(output_dir.glob("*/_SUCCESS.json"))
+    }
+    (workdir / "report.json").write_text(json.dumps(report))
+    if proc.returncode != 0:
+        tail = (workdir / "pipeline.log").read_text()[-2000:]
+        raise RuntimeError(f"pipeline exited with status {proc.returncode}: {tail}")
+    return "report.json", "application/json"
+
+
+@lru_cache
+def get_job_manager() -> JobManager:
+    """Return the process-wide job manager with the export and pipeline runners registered."""
+    manager = JobManager(JobStore(settings.job_dir), max_workers=settings.job_workers)
+    manager.register("export", run_export)
+    manager.register("pipeline", run_pipeline)
+    return manager
+
+
+def _status(record: JobRecord) -> JobStatus:
+    artifact_url = None
+    if record.status == SUCCEEDED:
+        artifact_url = f"{settings.api_v1_prefix}/jobs/{record.id}/artifact"
+    return JobStatus(
+        id=record.id,
+        kind=record.kind,
+        params=record.params,
+        status=record.status,
+        created_at=record.created_at,
+        started_at=record.started_at,
+        finished_at=record.finished_at,
+        error=record.error,
+        artifact_url=artifact_url,
+    )
+
+
+def _load(job_id: str) -> JobRecord:
+    if not re.fullmatch(r"[0-9a-f]{16}", job_id):
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+    try:
+        return get_job_manager().get(job_id)
+    except JobNotFound:
+        raise HTTPException(status_code=404, detail=f"Job '{job_id}' not found.")
+
+
+@router.post(
+    "/jobs",
+    summary="Enfileira uma exportação ou execução do pipeline.",
+    status_code=202,
+    response_model=JobStatus,
+)
+def submit_job(request: JobRequest) -> JobStatus:
+    """Cria (ou reaproveita, se os parâmetros forem os mesmos) um job em segundo plano."""
+    try:
+        params = PARAMS[request.kind](**request.params).model_dump(mode="json")
+    except ValidationError as exc:
+        raise HTTPException(status_code=422, detail=exc.errors(include_url=False))
+    try:
+        record = get_job_manager().submit(request.kind, params, force=request.force)
+    except JobActive as exc:
+        raise HTTPException(status_code=409, detail=str(exc))
+    return _status(record)
+
+
+@router.get(
+    "/jobs",
+    summary="Lista os jobs registrados.",
+    response_model=list[JobStatus],
+)
+def list_jobs() -> list[JobStatus]:
+    """Retorna os jobs do mais recente para o mais antigo."""
+    return [_status(r) for r in get_job_manager().store.list()]
+
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Status de um job.",
+    response_model=JobStatus,
+)
+def get_job(job_id: str) -> JobStatus:
+    """Retorna o status atual do job (``queued``, ``running``, ``succeeded`` ou ``failed``)."""
+    return _status(_load(job_id))
+
+
+@router.get(
+    "/jobs/{job_id}/artifact",
+    summary="Baixa o artefato de um job concluído.",
+    response_class=FileResponse,
+)
+def get_job_artifact(job_id: str) -> FileResponse:
+    """Entrega o arquivo produzido pelo job."""
+    record = _load(job_id)
+    if record.status != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"Job '{job_id}' is {record.status}.")
+    path = get_job_manager().store.artifact_path(record)
+    if not path.exists():
+        raise HTTPException(status_code=410, detail=f"Artifact of job '{job_id}' is no longer available.")
+    return FileResponse(path, media_type=record.media_type, filename=record.artifact)
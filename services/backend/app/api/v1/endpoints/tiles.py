@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import Response
+
+from app.core.config import get_settings
+from app.services.tiles import (
+    COLORMAPS,
+    RasterNotFound,
+    cached_tile,
+    list_rasters,
+    resolve_raster,
+    valid_tile,
+)
+
+router = APIRouter()
+settings = get_settings()
+
+
+@router.get(
+    "/tiles",
+    summary="Lista os rasters disponíveis para visualização em tiles.",
+)
+def list_tile_rasters() -> dict[str, list[str]]:
+    """Retorna os ids dos rasters (``<bacia>/<índice>``) e os colormaps disponíveis."""
+    return {"rasters": list_rasters(settings.raster_dir), "colormaps": sorted(COLORMAPS)}
+
+
+@router.get(
+    "/tiles/{raster:path}/{z}/{x}/{y}.png",
+    summary="Tile XYZ (PNG) de um raster de índice ou mosaico.",
+    response_class=Response,
+)
+def get_tile(
+    raster: str,
+    z: int,
+    x: int,
+    y: int,
+    colormap: str | None = Query(None, description="Sobrescreve o colormap padrão do índice."),
+    vmin: float | None = Query(None),
+    vmax: float | None = Query(None),
+) -> Response:
+    """Renderiza (ou lê do cache em disco) um tile Web Mercator do raster."""
+    if not valid_tile(z, x, y):
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates.")
+    if colormap is not None and colormap not in COLORMAPS:
+        raise HTTPException(status_code=400, detail=f"Unknown colormap '{colormap}'.")
+    try:
+        path = resolve_raster(settings.raster_dir, raster)
+    except RasterNotFound:
+        raise HTTPException(status_code=404, detail=f"Raster '{raster}' not found.")
+
+    png = cached_tile(settings.tile_cache_dir, path, z, x, y, colormap=colormap, vmin=vmin, vmax=vmax)
+    return Response(
+        content=png,
+        media_type="image/png",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db.session import get_db
+
+router = APIRouter()
+
+POINT_TIMESERIES_SQL = text(
+    """
+    WITH p AS (SELECT ST_SetSRID(ST_Point(:lon, :lat), 4326) AS geom)
+    SELECT
+        r.period_start,
+        r.period_end,
+        avg(ST_Value(r.rast, 1, p.geom)) AS value
+    FROM index_rasters r, p
+    WHERE r.index_name = :index_name
+      AND r.overview_factor = 1
+      AND ST_Intersects(r.rast, p.geom)
+    GROUP BY r.period_start, r.period_end
+    ORDER BY r.period_start
+    """
+)
+
+IMOVEL_TIMESERIES_SQL = text(
+    """
+    WITH p AS (SELECT ST_Transform(geom, 4326) AS geom FROM imoveis WHERE id = :imovel_id),
+    s AS (
+        SELECT
+            r.period_start,
+            r.period_end,
+            ST_SummaryStatsAgg(ST_Clip(r.rast, 1, p.geom, true), 1, true) AS stats
+        FROM index_rasters r, p
+        WHERE r.index_name = :index_name
+          AND r.overview_factor = 1
+          AND ST_Intersects(r.rast, p.geom)
+        GROUP BY r.period_start, r.period_end
+    )
+    SELECT
+        period_start,
+        period_end,
+        (stats).mean AS value,
+        (stats).min AS min,
+        (stats).max AS max,
+        (stats).stddev AS stddev,
+        (stats).count AS pixels
+    FROM s
+    ORDER BY period_start
+    """
+)
+
+IMOVEL_EXISTS_SQL = text("SELECT 1 FROM imoveis WHERE id = :imovel_id")
+
+
+@router.get(
+    "/timeseries",
+    summary="Série temporal de um índice (padrão NDVI) para um imóvel ou ponto.",
+)
+def index_timeseries(
+    imovel_id: int | None = Query(None, description="Id do imóvel (média dos pixels dentro do polígono)."),
+    lon: float | None = Query(None, ge=-180, le=180),
+    lat: float | None = Query(None, ge=-90, le=90),
+    index_name: str = Query("NDVI_med", alias="index", description="Índice carregado pelo pipeline."),
+    db: Session = Depends(get_db),
+) -> dict[str, Any]:
+    """Lê os valores por período direto dos tiles em ``index_rasters``, sem reprocessar imagens."""
+    if imovel_id is not None:
+        if db.execute(IMOVEL_EXISTS_SQL, {"imovel_id": imovel_id}).first() is None:
+            raise HTTPException(status_code=404, detail=f"Imóvel {imovel_id} not found.")
+        rows = db.execute(IMOVEL_TIMESERIES_SQL, {"imovel_id": imovel_id, "index_name": index_name})
+        target: dict[str, Any] = {"imovel_id": imovel_id}
+    elif lon is not None and lat is not None:
+        rows = db.execute(POINT_TIMESERIES_SQL, {"lon": lon, "lat": lat, "index_name": index_name})
+        target = {"lon": lon, "lat": lat}
+    else:
+        raise HTTPException(status_code=400, detail="Provide either imovel_id or both lon and lat.")
+
+    series = [dict(row._mapping) for row in rows]
+    return {"index": index_name, **target, "series": series}
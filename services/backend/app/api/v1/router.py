@@ -1,8 +1,11 @@
 from fastapi import APIRouter
 
-from app.api.v1.endpoints import health, imoveis, soja
+from app.api.v1.endpoints import health, imoveis, jobs, soja, tiles, timeseries
 
 api_router = APIRouter()
 api_router.include_router(health.router, prefix="/health", tags=["health"])
 api_router.include_router(imoveis.router, tags=["imoveis"])
 api_router.include_router(soja.router, tags=["soja"])
+api_router.include_router(tiles.router, tags=["tiles"])
+api_router.include_router(jobs.router, tags=["jobs"])
+api_router.include_router(timeseries.router, tags=["timeseries"])
@@ -29,6 +29,12 @@ class Settings(BaseSettings):
     project_name: str = "Vazio Sanitario API"
     api_v1_prefix: str = "/api/v1"
     database_url: str = "postgresql+psycopg://hack_user:hack_pass@db:5432/hackathon"
+    raster_dir: str = "/opt/app/rasters"
+    tile_cache_dir: str = "/tmp/tile_cache"
+    job_dir: str = "/tmp/jobs"
+    job_workers: int = 2
+    pipeline_command: str = "python -m utils.pipeline"
+    pipeline_workdir: str = "/opt/app/notebooks"
 
     model_config = SettingsConfigDict(env_prefix="", extra="allow")
 
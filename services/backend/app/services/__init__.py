@@ -0,0 +1 @@
+"""Domain services (raster rendering, background work) used by the endpoints."""
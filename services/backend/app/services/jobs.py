@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Callable
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+ACTIVE = (QUEUED, RUNNING)
+
+# runner(params, workdir) -> (nome do artefato dentro de workdir, media type)
+Runner = Callable[[dict[str, Any], Path], tuple[str, str]]
+
+
+class JobNotFound(LookupError):
+    """Raised when a job id has no record in the job store."""
+
+
+class UnknownJobKind(ValueError):
+    """Raised when a job is submitted for a kind with no registered runner."""
+
+
+class JobActive(RuntimeError):
+    """Raised when a forced re-run is requested while the same job is still queued or running."""
+
+
+@dataclass
+class JobRecord:
+    """Persisted state of a job (``<job_dir>/<id>/job.json``)."""
+
+    id: str
+    kind: str
+    params: dict[str, Any]
+    status: str = QUEUED
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str | None = None
+    artifact: str | None = None
+    media_type: str | None = None
+
+
+def job_id(kind: str, params: dict[str, Any]) -> str:
+    """Deterministic id for a kind and its parameters, used to deduplicate submissions."""
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()[:16]
+
+
+class JobStore:
+    """Disk-backed job records and artifacts, one directory per job id."""
+
+    def __init__(self, root: str | os.PathLike[str]) -> None:
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def workdir(self, job: str) -> Path:
+        return self.root / job
+
+    def load(self, job: str) -> JobRecord:
+        path = self.workdir(job) / "job.json"
+        if not path.exists():
+            raise JobNotFound(job)
+        return JobRecord(**json.loads(path.read_text()))
+
+    def save(self, record: JobRecord) -> None:
+        workdir = self.workdir(record.id)
+        workdir.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=workdir, suffix=".tmp")
+        with os.fdopen(fd, "w") as f:
+            json.dump(asdict(record), f, default=str)
+        os.replace(tmp, workdir / "job.json")
+
+    def artifact_path(self, record: JobRecord) -> Path:
+        return self.workdir(record.id) / record.artifact
+
+    def list(self) -> list[JobRecord]:
+        records = []
+        for path in self.root.glob("*/job.json"):
+            records.append(JobRecord(**json.loads(path.read_text())))
+        return sorted(records, key=lambda r: r.created_at, reverse=True)
+
+
+class JobManager:
+    """Run registered job kinds on a bounded local thread pool, persisting state in a ``JobStore``.
+
+    Submitting the same kind and parameters again returns the existing job while it is
+    queued, running or succeeded; failed jobs (or ``force=True``) are re-run. A forced
+    re-run of a job that is still queued or running raises ``JobActive``, since both runs
+    would share the same id and work directory. Runners do their heavy lifting in the
+    database or in subprocesses, so threads are enough to keep them off the request workers.
+
+    Jobs persisted as queued or running by a previous process are marked as failed on
+    startup: their threads died with that process and nothing would ever finish them.
+    """
+
+    def __init__(self, store: JobStore, max_workers: int = 2) -> None:
+        self.store = store
+        self.runners: dict[str, Runner] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        self._recover()
+
+    def _recover(self) -> None:
+        for record in self.store.list():
+            if record.status in ACTIVE:
+                record.status, record.error = FAILED, "Interrupted: the API restarted before the job finished."
+                record.finished_at = time.time()
+                self.store.save(record)
+
+    def register(self, kind: str, runner: Runner) -> None:
+        self.runners[kind] = runner
+
+    def submit(self, kind: str, params: dict[str, Any], force: bool = False) -> JobRecord:
+        if kind not in self.runners:
+            raise UnknownJobKind(f"Unknown job kind '{kind}'. Available: {sorted(self.runners)}")
+        job = job_id(kind, params)
+        with self._lock:
+            try:
+                existing = self.store.load(job)
+            except JobNotFound:
+                existing = None
+            if existing and existing.status in ACTIVE:
+                if force:
+                    raise JobActive(f"Job '{job}' is {existing.status}; wait for it to finish before forcing a re-run.")
+                return existing
+            if existing and not force and existing.status == SUCCEEDED:
+                if self.store.artifact_path(existing).exists():
+                    return existing
+            record = JobRecord(id=job, kind=kind, params=params)
+            self.store.save(record)
+            self._pool.submit(self._run, record)
+        return record
+
+    def get(self, job: str) -> JobRecord:
+        return self.store.load(job)
+
+    def _run(self, record: JobRecord) -> None:
+        record.status, record.started_at = RUNNING, time.time()
+        self.store.save(record)
+        try:
+            record.artifact, record.media_type = self.runners[record.kind](
+                record.params, self.store.workdir(record.id)
+            )
+            record.status = SUCCEEDED
+        except Exception as exc:  # o erro fica registrado no job, não derruba o worker
+            record.status, record.error = FAILED, f"{type(exc).__name__}: {exc}"
+        record.finished_at = time.time()
+        self.store.save(record)
@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+
+import numpy as np
+import rasterio
+from rasterio.enums import Resampling
+from rasterio.io import MemoryFile
+from rasterio.transform import from_bounds
+from rasterio.vrt import WarpedVRT
+from rasterio.warp import calculate_default_transform, transform_bounds
+
+TILE_SIZE = 256
+WEB_MERCATOR = "EPSG:3857"
+ORIGIN = 20037508.342789244  # meia circunferência do equador em EPSG:3857
+
+COLORMAPS: dict[str, list[str]] = {
+    "rdylgn": ["#a50026", "#f46d43", "#fee08b", "#d9ef8b", "#66bd63", "#006837"],
+    "rdbu": ["#b2182b", "#ef8a62", "#fddbc7", "#f7f7f7", "#d1e5f0", "#67a9cf", "#2166ac"],
+    "blues": ["#f7fbff", "#c6dbef", "#6baed6", "#2171b5", "#08306b"],
+    "viridis": ["#440154", "#3b528b", "#21918c", "#5ec962", "#fde725"],
+    "gray": ["#000000", "#ffffff"],
+}
+
+# (trecho do nome do raster, colormap, vmin, vmax) — a primeira ocorrência vence
+INDEX_STYLES: list[tuple[str, str, float, float]] = [
+    ("dNDVI", "rdbu", -0.5, 0.5),
+    ("NDVI_slope", "rdbu", -0.05, 0.05),
+    ("NDVI", "rdylgn", -0.2, 0.9),
+    ("NDWI", "blues", -0.5, 0.5),
+    ("RE2N", "rdylgn", -0.2, 0.8),
+    ("_dB", "gray", -25.0, 0.0),
+    ("VVVH", "gray", 0.0, 15.0),
+]
+DEFAULT_STYLE = ("viridis", 0.0, 1.0)
+
+
+class RasterNotFound(LookupError):
+    """Raised when a raster id does not map to a file under the raster directory."""
+
+
+@lru_cache(maxsize=None)
+def colormap_lut(name: str) -> np.ndarray:
+    """Return a 256x3 uint8 lookup table interpolated from the colormap stops."""
+    if name not in COLORMAPS:
+        raise ValueError(f"Unknown colormap '{name}'. Available: {sorted(COLORMAPS)}")
+    stops = np.array([[int(c[i : i + 2], 16) for i in (1, 3, 5)] for c in COLORMAPS[name]], dtype=float)
+    pos = np.linspace(0, 255, len(stops))
+    idx = np.arange(256)
+    return np.stack([np.interp(idx, pos, stops[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+
+
+def style_for(raster_id: str) -> tuple[str, float, float]:
+    """Pick the default colormap and value range from the index name in the raster id."""
+    for pattern, cmap, vmin, vmax in INDEX_STYLES:
+        if pattern in raster_id:
+            return cmap, vmin, vmax
+    return DEFAULT_STYLE
+
+
+def resolve_raster(raster_dir: str, raster_id: str) -> Path:
+    """Map ``<basin>/<name>`` to ``<raster_dir>/<basin>/<name>.tif`` without escaping the root."""
+    root = Path(raster_dir).resolve()
+    path = (root / f"{raster_id}.tif").resolve()
+    if root not in path.parents or not path.is_file():
+        raise RasterNotFound(raster_id)
+    return path
+
+
+def list_rasters(raster_dir: str) -> list[str]:
+    """List raster ids available under the raster directory."""
+    root = Path(raster_dir)
+    if not root.is_dir():
+        return []
+    return sorted(str(p.relative_to(root).with_suffix("")) for p in root.rglob("*.tif"))
+
+
+def tile_bounds(z: int, x: int, y: int) -> tuple[float, float, float, float]:
+    """Web Mercator bounds of an XYZ tile."""
+    size = 2 * ORIGIN / (1 << z)
+    minx = -ORIGIN + x * size
+    maxy = ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def _encode_png(rgba: np.ndarray) -> bytes:
+    with MemoryFile() as mem:
+        with mem.open(driver="PNG", width=rgba.shape[2], height=rgba.shape[1], count=4, dtype="uint8") as dst:
+            dst.write(rgba)
+        return mem.read()
+
+
+@lru_cache(maxsize=1)
+def empty_tile() -> bytes:
+    return _encode_png(np.zeros((4, TILE_SIZE, TILE_SIZE), dtype=np.uint8))
+
+
+def _overview_level(factors: list[int], scale: float) -> int | None:
+    """Index of the coarsest overview whose decimation factor does not exceed ``scale``."""
+    level = None
+    for i, factor in enumerate(factors):
+        if factor <= scale:
+            level = i
+    return level
+
+
+def render_tile(
+    path: Path,
+    z: int,
+    x: int,
+    y: int,
+    colormap: str | None = None,
+    vmin: float | None = None,
+    vmax: float | None = None,
+) -> bytes:
+    """Render one XYZ tile as PNG.
+
+    The source is opened at the COG overview closest to (and not coarser than)
+    the tile's metres per pixel and warped straight to 256x256, so the work per
+    tile stays bounded at every zoom level.
+    """
+    bounds = tile_bounds(z, x, y)
+    tile_res = (bounds[2] - bounds[0]) / TILE_SIZE
+    with rasterio.open(path) as src:
+        minx, miny, maxx, maxy = transform_bounds(src.crs, WEB_MERCATOR, *src.bounds)
+        if minx >= bounds[2] or maxx <= bounds[0] or miny >= bounds[3] or maxy <= bounds[1]:
+            return empty_tile()
+        if max(maxx - minx, maxy - miny) < tile_res:  # o raster inteiro cabe em menos de um pixel
+            return empty_tile()
+        native, _, _ = calculate_default_transform(src.crs, WEB_MERCATOR, src.width, src.height, *src.bounds)
+        overview_level = _overview_level(src.overviews(1), tile_res / abs(native.a))
+
+    with rasterio.open(path, overview_level=overview_level) as src:
+        rgb_source = src.count >= 3 and src.dtypes[0] == "uint8"
+        with WarpedVRT(
+            src,
+            crs=WEB_MERCATOR,
+            transform=from_bounds(*bounds, TILE_SIZE, TILE_SIZE),
+            width=TILE_SIZE,
+            height=TILE_SIZE,
+            resampling=Resampling.bilinear,
+            add_alpha=True,
+        ) as vrt:
+            indexes = [1, 2, 3] if rgb_source else [1]
+            out = vrt.read([*indexes, vrt.count])
+    data, alpha = out[:-1], out[-1] > 0
+
+    if rgb_source:
+        rgb = data
+    else:
+        band = data[0].astype("float32")
+        alpha &= np.isfinite(band)
+        default_cmap, default_vmin, default_vmax = style_for(path.stem)
+        lo = default_vmin if vmin is None else vmin
+        hi = default_vmax if vmax is None else vmax
+        scaled = np.clip((np.nan_to_num(band, nan=lo) - lo) / ((hi - lo) or 1.0), 0, 1)
+        rgb = colormap_lut(colormap or default_cmap)[(scaled * 255).astype(np.uint8)].transpose(2, 0, 1)
+
+    rgba = np.concatenate([rgb, (alpha * 255).astype(np.uint8)[None]], axis=0)
+    return _encode_png(rgba)
+
+
+def cached_tile(
+    cache_dir: str,
+    path: Path,
+    z: int,
+    x: int,
+    y: int,
+    colormap: str | None = None,
+    vmin: float | None = None,
+    vmax: float | None = None,
+) -> bytes:
+    """Return a tile from the disk cache, rendering and storing it on a miss.
+
+    The cache key includes the raster mtime, so regenerated rasters are never
+    served stale tiles.
+    """
+    stat = path.stat()
+    key = hashlib.sha1(f"{path}|{stat.st_mtime_ns}|{colormap}|{vmin}|{vmax}".encode()).hexdigest()[:16]
+    tile_path = Path(cache_dir) / key / str(z) / str(x) / f"{y}.png"
+    if tile_path.is_file():
+        return tile_path.read_bytes()
+
+    png = render_tile(path, z, x, y, colormap=colormap, vmin=vmin, vmax=vmax)
+    tile_path.parent.mkdir(parents=True, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=tile_path.parent, suffix=".tmp", delete=False) as tmp:
+        tmp.write(png)
+    os.replace(tmp.name, tile_path)
+    return png
+
+
+def valid_tile(z: int, x: int, y: int) -> bool:
+    """Check that the XYZ indices address an existing tile."""
+    return 0 <= z <= 24 and 0 <= x < (1 << z) and 0 <= y < (1 << z)